@@ -0,0 +1,90 @@
+# backend/scripts/bench_list_serialization.py
+"""
+Vergleicht die Kosten pro Zeile für die Antwort von GET /posts:
+
+  before: ORM-Objekt -> model_dump() -> PostOut-Validierung -> JSON  (alter Pfad)
+  after:  Row-Tupel -> rows_to_json()                                 (Fast Path)
+
+Läuft ohne Datenbank: die Zeilen werden synthetisch erzeugt, gemessen wird
+nur der Python-Anteil, der pro Zeile im Backend anfällt.
+
+    python backend/scripts/bench_list_serialization.py --rows 100 --repeat 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from simple_social_backend.main import PostOut
+from simple_social_backend.models import Post
+from simple_social_backend.serialize import orjson, rows_to_json
+
+
+def make_rows(n: int) -> list[tuple]:
+    base = datetime(2025, 1, 1, 12, 0, 0)
+    return [
+        (
+            i,
+            f"/images/original/{i}_user{i % 50}.png",
+            f"/images/thumbs/{i}_user{i % 50}.png" if i % 3 else None,
+            f"Beitrag Nummer {i} – Spaziergang am See mit Freunden 😊",
+            f"user{i % 50}",
+            base + timedelta(seconds=i),
+        )
+        for i in range(n)
+    ]
+
+
+_POST_LIST = TypeAdapter(list[PostOut])
+
+
+def before(rows: list[tuple]) -> bytes:
+    # entspricht dem alten get_all_posts() + FastAPI response_model + JSONResponse
+    posts = [
+        Post(id=r[0], image=r[1], image_small=r[2], text=r[3], user=r[4], created_at=r[5])
+        for r in rows
+    ]
+    dumped = [p.model_dump() for p in posts]
+    validated = _POST_LIST.validate_python(dumped)
+    content = jsonable_encoder(_POST_LIST.dump_python(validated, mode="json"))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def after(rows: list[tuple]) -> bytes:
+    return rows_to_json(rows)
+
+
+def bench(fn, rows: list[tuple], repeat: int) -> float:
+    fn(rows)  # warmup
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(rows)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(rows))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="rows per response (page size)")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.rows)
+    assert json.loads(before(rows)) == json.loads(after(rows)), "fast path liefert anderes JSON"
+
+    t_before = bench(before, rows, args.repeat)
+    t_after = bench(after, rows, args.repeat)
+
+    print(f"rows/response: {args.rows}, repeat: {args.repeat}, orjson: {orjson is not None}")
+    print(f"before: {t_before * 1e6:8.2f} µs/row")
+    print(f"after:  {t_after * 1e6:8.2f} µs/row")
+    print(f"speedup: {t_before / t_after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
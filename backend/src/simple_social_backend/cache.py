@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Protocol
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+POST_CACHE_TTL_SECONDS = float(os.getenv("POST_CACHE_TTL_SECONDS", "5"))
+POST_CACHE_MAX_ENTRIES = int(os.getenv("POST_CACHE_MAX_ENTRIES", "10000"))
+# optional: gemeinsamer Cache für mehrere Worker/Container, z.B. redis://redis:6379/0
+CACHE_URL = os.getenv("CACHE_URL", "")
+
+
+class TTLCache:
+    """
+    Kleiner thread-sicherer LRU-Cache mit Ablaufzeit (in-process).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds: float | None = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# -----------------------------------------------------------------------------
+# Backends für den Read-Through-Cache
+# -----------------------------------------------------------------------------
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Any | None: ...
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None: ...
+    async def delete(self, *keys: str) -> None: ...
+    async def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    """In-process LRU mit TTL (Default)."""
+
+    def __init__(self, max_entries: int):
+        self._cache = TTLCache(ttl_seconds=0, max_entries=max_entries)
+
+    async def get(self, key: str) -> Any | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._cache.set(key, value, ttl_seconds)
+
+    async def delete(self, *keys: str) -> None:
+        self._cache.delete(*keys)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+class RedisBackend:
+    """
+    Gemeinsamer Cache über Redis – Invalidierungen wirken dann über alle Prozesse.
+    Werte werden als JSON abgelegt (datetime -> ISO-String, PostOut parst das wieder).
+    """
+
+    def __init__(self, url: str, prefix: str = "simple-social:"):
+        if aioredis is None:
+            raise RuntimeError("CACHE_URL gesetzt, aber das Paket 'redis' ist nicht installiert")
+        self._client = aioredis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Any | None:
+        raw = await self._client.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        raw = json.dumps(value, default=_json_default)
+        await self._client.set(self._prefix + key, raw, px=int(ttl_seconds * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*(self._prefix + k for k in keys))
+
+    async def clear(self) -> None:
+        async for key in self._client.scan_iter(match=self._prefix + "*"):
+            await self._client.delete(key)
+
+
+def _default_backend() -> CacheBackend:
+    if CACHE_URL:
+        return RedisBackend(CACHE_URL)
+    return MemoryBackend(POST_CACHE_MAX_ENTRIES)
+
+
+# -----------------------------------------------------------------------------
+# Read-Through mit Single-Flight
+# -----------------------------------------------------------------------------
+class ReadThroughCache:
+    """
+    get_or_load(): Treffer aus dem Backend, sonst genau EIN Loader pro Key –
+    gleichzeitige Misses warten auf dasselbe Ergebnis.
+    invalidate() nimmt laufende Loads aus der Tabelle, damit ein Loader, der vor
+    der Invalidierung gestartet wurde, keinen veralteten Wert mehr zurückschreibt.
+    None wird nicht gecacht (z.B. Post existiert (noch) nicht).
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl_seconds <= 0:
+            return await loader()
+
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            if value is not None and self._inflight.get(key) is future:
+                await self.backend.set(key, value, self.ttl_seconds)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Wartende bekommen die Exception; hier nicht doppelt melden
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            # laufende Loads nicht mehr teilen – deren Ergebnis ist evtl. schon veraltet
+            self._inflight.pop(key, None)
+        await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        self._inflight.clear()
+        await self.backend.clear()
+
+
+POST_CACHE = ReadThroughCache(_default_backend(), POST_CACHE_TTL_SECONDS)
+
+
+def post_key(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+LATEST_POST_KEY = "post:latest"
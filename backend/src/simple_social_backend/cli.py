@@ -1,4 +1,8 @@
+import argparse
 import os
+import sys
+import time
+from datetime import datetime
 from pathlib import Path
 import uvicorn
 from dotenv import load_dotenv
@@ -10,14 +14,100 @@ def _load_env_local():
     if env_file.exists():
         load_dotenv(env_file, override=False)
 
-def seed():
+def seed(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="social-seed",
+        description="Seed demo posts, or bulk-generate synthetic posts for scale tests.",
+    )
+    parser.add_argument("--posts", type=int, default=0, help="number of synthetic posts (0 = 3 demo posts)")
+    parser.add_argument("--users", type=int, default=1000, help="number of distinct synthetic users")
+    parser.add_argument("--days", type=int, default=365, help="spread created_at over the last N days")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="rows per COPY/commit")
+    parser.add_argument("--method", choices=["copy", "insert"], default="copy")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    args = parser.parse_args(argv)
+    if args.posts < 0:
+        parser.error("--posts must be >= 0")
+    if args.users < 1:
+        parser.error("--users must be >= 1")
+    if args.days < 1:
+        parser.error("--days must be >= 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be >= 1")
+
     _load_env_local()
-    from .db import init_db, add_post
+    from .db import init_db, add_post, get_engine
+    init_db()
+
+    if args.posts <= 0:
+        add_post("images/cat.png",  "Süße Katze!",            "alice")
+        add_post("images/lake.jpg", "Spaziergang am See.",    "bob")
+        add_post("images/meal.jpg", "Veganes Mittagessen 😋", "carol")
+        print("Seeded 3 posts.")
+        return
+
+    from .synthetic import copy_posts, generate_posts, insert_posts
+    rows = generate_posts(args.posts, args.users, days=args.days, seed=args.seed)
+    load = copy_posts if args.method == "copy" else insert_posts
+
+    start = time.perf_counter()
+    total = load(get_engine(), rows, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {total} synthetic posts for {args.users} users in {elapsed:.1f}s "
+          f"({total / max(elapsed, 1e-9):,.0f} rows/s, method={args.method}).")
+
+def migrate():
+    _load_env_local()
+    from .db import init_db
+    applied = init_db()
+    if not applied:
+        print("Schema is up to date.")
+    for m in applied:
+        print(f"Applied migration {m.version:04d}_{m.name}")
+
+def export(argv=None):
+    parser = argparse.ArgumentParser(prog="social-export", description="Stream posts as NDJSON or CSV.")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--user", default=None, help="only posts of this user")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="created_at >= SINCE (ISO)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="created_at < UNTIL (ISO)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    _load_env_local()
+    from .db import iter_posts_for_export
+    from .export import render_export
+
+    rows = iter_posts_for_export(user=args.user, since=args.since, until=args.until)
+    if args.output == "-":
+        out = sys.stdout
+    else:
+        out = open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in render_export(rows, args.format):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def migrate_images(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="social-migrate-images",
+        description="Move legacy images into the content-addressed store and rebuild refcounts.",
+    )
+    parser.add_argument("--images-dir", default=os.getenv("IMAGES_DIR"), help="default: $IMAGES_DIR or repo_root/images")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would happen")
+    args = parser.parse_args(argv)
+
+    _load_env_local()
+    from .db import get_engine, init_db
+    from .image_store import ImageStore, migrate_legacy_images
+
+    images_dir = Path(args.images_dir or Path(__file__).resolve().parents[3] / "images").resolve()
     init_db()
-    add_post("images/cat.png",  "Süße Katze!",            "alice")
-    add_post("images/lake.jpg", "Spaziergang am See.",    "bob")
-    add_post("images/meal.jpg", "Veganes Mittagessen 😋", "carol")
-    print("Seeded 3 posts.")
+    stats = migrate_legacy_images(get_engine(), ImageStore(images_dir), dry_run=args.dry_run)
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"{prefix}{images_dir}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
 
 def start_api():
     _load_env_local()
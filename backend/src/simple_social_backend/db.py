@@ -1,29 +1,39 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+from typing import Callable, Optional
 from datetime import datetime
 
-from sqlmodel import SQLModel, create_engine, Session, select
+from sqlalchemy import text, tuple_
+from sqlmodel import create_engine, Session, select
 
+from .events import IMAGE_RESIZE_QUEUE, TEXTGEN_QUEUE, _disabled, image_resize_body, textgen_job_body
+from .image_store import thumb_url_for
+from .migrations import migrate
 from .models import Post, TextGenJob
+from .pagination import clamp_limit, decode_cursor, encode_cursor, encode_search_cursor
+from .search import SEARCH_CACHE, build_search_statement, normalize_query
 
 
 ENGINE = None  # wird lazy erzeugt
 
 
-def _create_engine():
-    """
-    ✅ NUR Postgres – KEIN SQLite.
-    Engine wird lazy gebaut, damit pytest collection nicht crasht.
-    """
+def database_url() -> str:
     url = os.getenv("DATABASE_URL")
     if not url:
         raise RuntimeError(
             "Keine Datenbank-URL gesetzt. Bitte setze DATABASE_URL "
             "(SQLite/social.db ist deaktiviert)."
         )
-    return create_engine(url, echo=False, pool_pre_ping=True)
+    return url
+
+
+def _create_engine():
+    """
+    ✅ NUR Postgres – KEIN SQLite.
+    Engine wird lazy gebaut, damit pytest collection nicht crasht.
+    """
+    return create_engine(database_url(), echo=False, pool_pre_ping=True)
 
 def get_engine():
     global ENGINE
@@ -38,31 +48,208 @@ def reset_engine_for_tests():
 
 
 def init_db():
-    SQLModel.metadata.create_all(get_engine())
+    """
+    Bringt das Schema auf den neuesten Stand (siehe migrations.py).
+    Wird von `social-migrate`, `social-seed` und den Tests aufgerufen – NICHT beim App-Start.
+    """
+    return migrate(get_engine())
 
 
-def add_post(image: str, text: str, user: str) -> int:
-    with Session(get_engine()) as session:
-        post = Post(
-            image=image,
-            image_small=None,
-            text=text,
-            user=user,
-            created_at=datetime.now(),
-        )
-        session.add(post)
-        session.commit()
-        session.refresh(post)
-        return post.id
+# ---------------------------
+# Statement-Helfer (gemeinsam mit db_async.py)
+# ---------------------------
+
+def _new_post(image: str, text: str, user: str) -> Post:
+    now = datetime.now()
+    return Post(
+        image=image,
+        image_small=None,
+        text=text,
+        user=user,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def _new_textgen_job(prompt: str, max_new_tokens: int) -> TextGenJob:
+    return TextGenJob(
+        prompt=prompt,
+        max_new_tokens=max_new_tokens,
+        status="pending",
+        created_at=datetime.now(),
+    )
+
+
+# Referenzzähler für Bilder (Dedup im ImageStore): gleiche Transaktion wie der Post
+_IMAGE_REF_ACQUIRE_SQL = text(
+    "INSERT INTO image_ref (image, refcount) VALUES (:image, 1) "
+    "ON CONFLICT (image) DO UPDATE SET refcount = image_ref.refcount + 1"
+)
+_IMAGE_REF_RELEASE_SQL = text(
+    "UPDATE image_ref SET refcount = refcount - 1 WHERE image = :image RETURNING refcount"
+)
+# Zeilen mit refcount 0 bleiben stehen, bis reclaim_orphaned_images() die Dateien unter
+# Zeilensperre gelöscht hat – sonst könnte ein paralleler Upload gegen eine Datei
+# deduplizieren, die gleich darauf verschwindet.
+# Upsert statt SELECT ... FOR UPDATE: sperrt auch eine (noch) fehlende Zeile und wartet dabei
+# auf einen parallelen, noch nicht committeten Upload derselben Datei (Unique-Konflikt).
+_IMAGE_REF_LOCK_SQL = text(
+    "INSERT INTO image_ref (image, refcount) VALUES (:image, 0) "
+    "ON CONFLICT (image) DO UPDATE SET refcount = image_ref.refcount RETURNING refcount"
+)
+_IMAGE_REF_DROP_SQL = text("DELETE FROM image_ref WHERE image = :image AND refcount <= 0")
+
+# Transactional Outbox (siehe outbox.py): Event-Zeile in derselben Transaktion wie die Daten.
+# Bei deaktivierten Queues läuft kein Relay -> dann gar nicht erst einfügen, sonst wächst die Tabelle endlos.
+_OUTBOX_INSERT_SQL = text("INSERT INTO event_outbox (queue, body) VALUES (:queue, :body)")
+
+
+def _image_resize_event(post: Post) -> dict:
+    return {"queue": IMAGE_RESIZE_QUEUE, "body": image_resize_body(post.id, post.image)}
+
+
+def _textgen_job_event(job: TextGenJob) -> dict:
+    return {"queue": TEXTGEN_QUEUE, "body": textgen_job_body(job.id, job.prompt, job.max_new_tokens)}
+
+
+def _orphaned_images(post: Post, remaining: int | None) -> list[str]:
+    """
+    Dateien, die nach dem Löschen des Posts niemand mehr braucht.
+    remaining is None => Bild wird nicht gezählt (Altbestand) -> nichts löschen.
+    """
+    if remaining is None or remaining > 0:
+        return []
+    urls = [post.image, thumb_url_for(post.image)]
+    if post.image_small and post.image_small not in urls:
+        urls.append(post.image_small)
+    return urls
+
+
+# last_value ist nicht transaktional: immer der zuletzt vergebene Wert, auch aus laufenden Transaktionen
+_POST_TABLE_VERSION_SQL = text("SELECT last_value FROM post_version_seq")
+
+
+def _latest_post_stmt():
+    return select(Post).order_by(Post.created_at.desc(), Post.id.desc()).limit(1)
+
+
+def _all_posts_stmt(user: Optional[str]):
+    stmt = select(Post)
+    if user is not None:
+        stmt = stmt.where(Post.user == user)
+    return stmt.order_by(Post.created_at, Post.id)
+
+
+# Spalten für den Fast Path (Reihenfolge == serialize.POST_OUT_FIELDS)
+_POST_OUT_COLUMNS = (Post.id, Post.image, Post.image_small, Post.text, Post.user, Post.created_at)
 
 
+def _posts_page_stmt(user: Optional[str], limit: int, cursor: str | None, columns=None):
+    stmt = select(*columns) if columns else select(Post)
+    if user is not None:
+        stmt = stmt.where(Post.user == user)
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Post.created_at, Post.id) < tuple_(created_at, post_id))
+    # eine Zeile mehr holen, um zu wissen, ob es eine nächste Seite gibt
+    return stmt.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+
+def _export_stmt(user: Optional[str], since: datetime | None, until: datetime | None):
+    """
+    Nur die Export-Spalten als Tupel (keine ORM-Objekte), älteste zuerst.
+    yield_per => psycopg benutzt einen Server-Side-Cursor, Speicher bleibt flach.
+    """
+    stmt = select(Post.id, Post.user, Post.text, Post.image, Post.image_small, Post.created_at)
+    if user is not None:
+        stmt = stmt.where(Post.user == user)
+    if since is not None:
+        stmt = stmt.where(Post.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Post.created_at < until)
+    stmt = stmt.order_by(Post.created_at, Post.id)
+    return stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _posts_page_result(posts, limit: int) -> tuple[list[dict], str | None]:
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        last = posts[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return [p.model_dump() for p in posts], next_cursor
+
+
+def _post_rows_page_result(rows, limit: int) -> tuple[list, str | None]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+
+def _search_result(rows, limit: int) -> tuple[list[dict], str | None]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_post, last_rank = rows[-1]
+        next_cursor = encode_search_cursor(last_rank, last_post.id)
+    return [post.model_dump() for post, _rank in rows], next_cursor
+
+
+# ---------------------------
+# Post
+# ---------------------------
+
 def get_latest_post() -> dict | None:
     with Session(get_engine()) as session:
-        stmt = select(Post).order_by(Post.created_at.desc(), Post.id.desc()).limit(1)
-        post = session.exec(stmt).first()
+        post = session.exec(_latest_post_stmt()).first()
         return post.model_dump() if post else None
 
 
+def add_post(
+    image: str,
+    text: str,
+    user: str,
+    store: Callable[[], object] | None = None,
+    remove: Callable[..., None] | None = None,
+) -> int:
+    """
+    store() legt die Bilddatei ab (ImageStore.put, nur ein rename aus dem Upload-Tmp-Verzeichnis).
+    Es läuft, nachdem die image_ref-Zeile gesperrt und hochgezählt ist, damit kein paralleles
+    Löschen die Datei dazwischen entfernt. Scheitert die Transaktion danach, räumt remove()
+    die Datei wieder weg – sofern sie dann von keinem Post referenziert wird.
+    """
+    stored = False
+    with Session(get_engine()) as session:
+        try:
+            post = _new_post(image, text, user)
+            session.add(post)
+            session.flush()  # post.id für das Resize-Event
+            session.execute(_IMAGE_REF_ACQUIRE_SQL, {"image": image})
+            if store is not None:
+                store()
+                stored = True
+            if not _disabled():
+                session.execute(_OUTBOX_INSERT_SQL, _image_resize_event(post))
+            session.commit()
+        except BaseException:
+            session.rollback()
+            if stored and remove is not None:
+                # Aufräumen darf den eigentlichen Fehler nicht verdecken
+                try:
+                    reclaim_orphaned_images([image, thumb_url_for(image)], remove)
+                except Exception as exc:
+                    print(f"[images] cleanup after failed add_post failed: {exc}")
+            raise
+        session.refresh(post)
+        return post.id
+
+
 def get_post_by_id(post_id: int) -> dict | None:
     with Session(get_engine()) as session:
         post = session.get(Post, post_id)
@@ -71,27 +258,111 @@ def get_post_by_id(post_id: int) -> dict | None:
 
 def get_all_posts(user: Optional[str] = None) -> list[dict]:
     with Session(get_engine()) as session:
-        stmt = select(Post)
-        if user is not None:
-            stmt = stmt.where(Post.user == user)
-        stmt = stmt.order_by(Post.created_at, Post.id)
-        posts = session.exec(stmt).all()
+        posts = session.exec(_all_posts_stmt(user)).all()
         return [p.model_dump() for p in posts]
 
 
-def search_posts(query: str) -> list[dict]:
+def get_posts_page(
+    user: Optional[str] = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Keyset-Pagination, neueste zuerst, auf (created_at, id).
+    Liefert (posts, next_cursor); next_cursor ist None auf der letzten Seite.
+    Kosten pro Seite hängen nicht von der Tabellengröße ab (kein OFFSET).
+    """
+    limit = clamp_limit(limit)
     with Session(get_engine()) as session:
-        stmt = select(Post).where(Post.text.contains(query))
-        posts = session.exec(stmt).all()
-        return [p.model_dump() for p in posts]
+        posts = session.exec(_posts_page_stmt(user, limit, cursor)).all()
+        return _posts_page_result(posts, limit)
+
+
+def get_posts_page_rows(
+    user: Optional[str] = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list, str | None]:
+    """
+    Wie get_posts_page(), aber als Row-Tupel (serialize.POST_OUT_FIELDS) statt
+    ORM-Objekt -> dict. Für den Fast Path der Listen-Endpunkte.
+    """
+    limit = clamp_limit(limit)
+    with Session(get_engine()) as session:
+        rows = session.execute(_posts_page_stmt(user, limit, cursor, columns=_POST_OUT_COLUMNS)).all()
+        return _post_rows_page_result(rows, limit)
+
+
+def get_post_table_version() -> int:
+    """Änderungszähler der post-Tabelle (Sequence + Trigger, Migration 6) – billige Basis für ETags."""
+    with Session(get_engine()) as session:
+        return session.execute(_POST_TABLE_VERSION_SQL).scalar_one_or_none() or 0
+
+
+def iter_posts_for_export(
+    user: Optional[str] = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """Streamt alle passenden Posts als Row-Tupel (siehe export.EXPORT_COLUMNS)."""
+    with Session(get_engine()) as session:
+        yield from session.execute(_export_stmt(user, since, until))
+
+
+def search_posts(
+    query: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Ranked Volltextsuche über den GIN-Index auf post.text (deutsch).
+    Liefert (posts, next_cursor); heiße Anfragen kommen kurz aus SEARCH_CACHE.
+    """
+    normalized = normalize_query(query)
+    if not normalized:
+        return [], None
 
+    limit = clamp_limit(limit)
+    key = (normalized, limit, cursor)
+    cached = SEARCH_CACHE.get(key)
+    if cached is not None:
+        return cached
 
-def delete_post(post_id: int) -> bool:
+    with Session(get_engine()) as session:
+        stmt = build_search_statement(normalized, limit=limit, cursor=cursor)
+        rows = session.exec(stmt).all()
+        result = _search_result(rows, limit)
+
+    SEARCH_CACHE.set(key, result)
+    return result
+
+
+def delete_post(post_id: int) -> list[str] | None:
+    """
+    Löscht den Post. None => nicht gefunden, sonst die Bild-URLs,
+    deren Referenzzähler auf 0 gefallen ist (Aufrufer löscht die Dateien).
+    """
     with Session(get_engine()) as session:
         post = session.get(Post, post_id)
         if post is None:
-            return False
+            return None
         session.delete(post)
+        remaining = session.execute(_IMAGE_REF_RELEASE_SQL, {"image": post.image}).scalar_one_or_none()
+        session.commit()
+        return _orphaned_images(post, remaining)
+
+
+def reclaim_orphaned_images(orphaned: list[str], remove: Callable[..., None]) -> bool:
+    """
+    Löscht die Dateien aus delete_post() – aber nur, wenn der Zähler von orphaned[0]
+    unter Zeilensperre immer noch 0 ist (inzwischen kein neuer Post mit demselben Bild).
+    """
+    with Session(get_engine()) as session:
+        refcount = session.execute(_IMAGE_REF_LOCK_SQL, {"image": orphaned[0]}).scalar_one()
+        if refcount > 0:
+            return False
+        remove(*orphaned)
+        session.execute(_IMAGE_REF_DROP_SQL, {"image": orphaned[0]})
         session.commit()
         return True
 
@@ -102,6 +373,7 @@ def set_post_thumbnail(post_id: int, image_small: str) -> dict | None:
         if post is None:
             return None
         post.image_small = image_small
+        post.updated_at = datetime.now()
         session.add(post)
         session.commit()
         session.refresh(post)
@@ -114,13 +386,11 @@ def set_post_thumbnail(post_id: int, image_small: str) -> dict | None:
 
 def create_textgen_job(prompt: str, max_new_tokens: int) -> dict:
     with Session(get_engine()) as session:
-        job = TextGenJob(
-            prompt=prompt,
-            max_new_tokens=max_new_tokens,
-            status="pending",
-            created_at=datetime.now(),
-        )
+        job = _new_textgen_job(prompt, max_new_tokens)
         session.add(job)
+        session.flush()
+        if not _disabled():
+            session.execute(_OUTBOX_INSERT_SQL, _textgen_job_event(job))
         session.commit()
         session.refresh(job)
         return job.model_dump()
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import weakref
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db import (
+    database_url,
+    _new_post,
+    _new_textgen_job,
+    _latest_post_stmt,
+    _all_posts_stmt,
+    _posts_page_stmt,
+    _posts_page_result,
+    _search_result,
+    _export_stmt,
+    _post_rows_page_result,
+    _POST_OUT_COLUMNS,
+    _IMAGE_REF_ACQUIRE_SQL,
+    _IMAGE_REF_RELEASE_SQL,
+    _IMAGE_REF_DROP_SQL,
+    _IMAGE_REF_LOCK_SQL,
+    _orphaned_images,
+    _POST_TABLE_VERSION_SQL,
+    _OUTBOX_INSERT_SQL,
+    _image_resize_event,
+    _textgen_job_event,
+)
+from .cache import LATEST_POST_KEY, POST_CACHE, post_key
+from .events import _disabled
+from .image_store import thumb_url_for
+from .models import Post, TextGenJob
+from .pagination import clamp_limit
+from .search import SEARCH_CACHE, build_search_statement, normalize_query
+
+
+# Async-Pendant zu db.py für die FastAPI-Endpunkte.
+# Parallelität wird durch den DB-Pool begrenzt, nicht durch den Threadpool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Eine Engine pro Event-Loop: Async-Connections sind an ihren Loop gebunden
+# (im Betrieb gibt es genau einen, der TestClient startet aber ggf. mehrere).
+_ENGINES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncEngine]" = weakref.WeakKeyDictionary()
+
+
+def _create_async_engine() -> AsyncEngine:
+    # postgresql+psycopg:// wählt mit create_async_engine automatisch psycopg (async)
+    return create_async_engine(
+        database_url(),
+        echo=False,
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+
+
+def get_async_engine() -> AsyncEngine:
+    loop = asyncio.get_running_loop()
+    engine = _ENGINES.get(loop)
+    if engine is None:
+        engine = _create_async_engine()
+        _ENGINES[loop] = engine
+    return engine
+
+
+async def dispose_async_engine() -> None:
+    """Schließt den Pool des aktuellen Loops (App-Shutdown)."""
+    engine = _ENGINES.pop(asyncio.get_running_loop(), None)
+    if engine is not None:
+        await engine.dispose()
+
+
+def _session() -> AsyncSession:
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+# ---------------------------
+# Post
+# ---------------------------
+
+async def add_post(
+    image: str,
+    text: str,
+    user: str,
+    store: Callable[[], object] | None = None,
+    remove: Callable[..., None] | None = None,
+) -> int:
+    """
+    store()/remove() (blockierend, laufen im Threadpool) wie in db.add_post: store erst nach
+    dem Sperren der image_ref-Zeile, remove nur, wenn die Transaktion danach scheitert.
+    """
+    stored = False
+    async with _session() as session:
+        try:
+            post = _new_post(image, text, user)
+            session.add(post)
+            await session.flush()  # post.id für das Resize-Event
+            await session.execute(_IMAGE_REF_ACQUIRE_SQL, {"image": image})
+            if store is not None:
+                await run_in_threadpool(store)
+                stored = True
+            if not _disabled():
+                await session.execute(_OUTBOX_INSERT_SQL, _image_resize_event(post))
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            if stored and remove is not None:
+                try:
+                    await reclaim_orphaned_images([image, thumb_url_for(image)], remove)
+                except Exception as exc:
+                    print(f"[images] cleanup after failed add_post failed: {exc}")
+            raise
+        await session.refresh(post)
+    await POST_CACHE.invalidate(LATEST_POST_KEY)
+    return post.id
+
+
+async def _load_latest_post() -> dict | None:
+    async with _session() as session:
+        post = (await session.exec(_latest_post_stmt())).first()
+        return post.model_dump() if post else None
+
+
+async def get_latest_post() -> dict | None:
+    return await POST_CACHE.get_or_load(LATEST_POST_KEY, _load_latest_post)
+
+
+async def _load_post_by_id(post_id: int) -> dict | None:
+    async with _session() as session:
+        post = await session.get(Post, post_id)
+        return post.model_dump() if post else None
+
+
+async def get_post_by_id(post_id: int) -> dict | None:
+    return await POST_CACHE.get_or_load(post_key(post_id), lambda: _load_post_by_id(post_id))
+
+
+async def get_all_posts(user: Optional[str] = None) -> list[dict]:
+    async with _session() as session:
+        posts = (await session.exec(_all_posts_stmt(user))).all()
+        return [p.model_dump() for p in posts]
+
+
+async def get_posts_page(
+    user: Optional[str] = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], str | None]:
+    limit = clamp_limit(limit)
+    async with _session() as session:
+        posts = (await session.exec(_posts_page_stmt(user, limit, cursor))).all()
+        return _posts_page_result(posts, limit)
+
+
+async def get_posts_page_rows(
+    user: Optional[str] = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list, str | None]:
+    limit = clamp_limit(limit)
+    async with _session() as session:
+        result = await session.execute(_posts_page_stmt(user, limit, cursor, columns=_POST_OUT_COLUMNS))
+        return _post_rows_page_result(result.all(), limit)
+
+
+async def get_post_table_version() -> int:
+    async with _session() as session:
+        return (await session.execute(_POST_TABLE_VERSION_SQL)).scalar_one_or_none() or 0
+
+
+async def iter_posts_for_export(
+    user: Optional[str] = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    async with _session() as session:
+        result = await session.stream(_export_stmt(user, since, until))
+        async for row in result:
+            yield row
+
+
+async def search_posts(
+    query: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], str | None]:
+    normalized = normalize_query(query)
+    if not normalized:
+        return [], None
+
+    limit = clamp_limit(limit)
+    key = (normalized, limit, cursor)
+    cached = SEARCH_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    async with _session() as session:
+        stmt = build_search_statement(normalized, limit=limit, cursor=cursor)
+        rows = (await session.exec(stmt)).all()
+        result = _search_result(rows, limit)
+
+    SEARCH_CACHE.set(key, result)
+    return result
+
+
+async def delete_post(post_id: int) -> list[str] | None:
+    async with _session() as session:
+        post = await session.get(Post, post_id)
+        if post is None:
+            return None
+        await session.delete(post)
+        remaining = (await session.execute(_IMAGE_REF_RELEASE_SQL, {"image": post.image})).scalar_one_or_none()
+        await session.commit()
+    await POST_CACHE.invalidate(post_key(post_id), LATEST_POST_KEY)
+    return _orphaned_images(post, remaining)
+
+
+async def reclaim_orphaned_images(orphaned: list[str], remove: Callable[..., None]) -> bool:
+    """Wie db.reclaim_orphaned_images: Dateien nur löschen, wenn der Zähler unter Sperre noch 0 ist."""
+    async with _session() as session:
+        refcount = (await session.execute(_IMAGE_REF_LOCK_SQL, {"image": orphaned[0]})).scalar_one()
+        if refcount > 0:
+            return False
+        await run_in_threadpool(remove, *orphaned)
+        await session.execute(_IMAGE_REF_DROP_SQL, {"image": orphaned[0]})
+        await session.commit()
+        return True
+
+
+async def set_post_thumbnail(post_id: int, image_small: str) -> dict | None:
+    async with _session() as session:
+        post = await session.get(Post, post_id)
+        if post is None:
+            return None
+        post.image_small = image_small
+        post.updated_at = datetime.now()
+        session.add(post)
+        await session.commit()
+        await session.refresh(post)
+    await POST_CACHE.invalidate(post_key(post_id), LATEST_POST_KEY)
+    return post.model_dump()
+
+
+# ---------------------------
+# TextGenJob
+# ---------------------------
+
+async def create_textgen_job(prompt: str, max_new_tokens: int) -> dict:
+    async with _session() as session:
+        job = _new_textgen_job(prompt, max_new_tokens)
+        session.add(job)
+        await session.flush()
+        if not _disabled():
+            await session.execute(_OUTBOX_INSERT_SQL, _textgen_job_event(job))
+        await session.commit()
+        await session.refresh(job)
+        return job.model_dump()
+
+
+async def get_textgen_job(job_id: int) -> dict | None:
+    async with _session() as session:
+        job = await session.get(TextGenJob, job_id)
+        return job.model_dump() if job else None
+
+
+async def set_textgen_job_result(job_id: int, status: str, generated_text: str | None, error: str | None) -> dict | None:
+    async with _session() as session:
+        job = await session.get(TextGenJob, job_id)
+        if job is None:
+            return None
+        job.status = status
+        job.generated_text = generated_text
+        job.error = error
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+        return job.model_dump()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime
+
+from fastapi import Request, Response
+
+
+# Clients (Browser-Cache, Frontend-Polling) sollen immer revalidieren
+CACHE_CONTROL = "no-cache"
+
+
+def _as_datetime(value) -> datetime | None:
+    # Cache-Treffer aus Redis haben ISO-Strings statt datetime
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def post_etag(post: dict) -> str:
+    """
+    Starkes ETag aus id + updated_at – ohne den Post zu serialisieren.
+    """
+    version = _as_datetime(post.get("updated_at")) or _as_datetime(post.get("created_at"))
+    stamp = int(version.timestamp() * 1_000_000) if version else 0
+    return f'"post-{post["id"]}-{stamp}"'
+
+
+def collection_etag(request: Request, table_version: int) -> str:
+    """
+    ETag für Listen: Änderungszähler der Tabelle + Pfad/Query (user, limit, cursor, ...).
+    """
+    resource = f"{request.url.path}?{request.url.query}"
+    params = hashlib.blake2b(resource.encode("utf-8"), digest_size=8).hexdigest()
+    return f'"posts-{table_version}-{params}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match vergleicht schwach: W/"x" passt auf "x"
+    candidates = (c.strip().removeprefix("W/") for c in if_none_match.split(","))
+    return etag in candidates
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Setzt ETag/Cache-Control auf der Antwort. Passt If-None-Match,
+    kommt eine fertige 304-Antwort zurück, sonst None.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+import weakref
+from typing import Optional
+from urllib.parse import quote
+
+import aio_pika
+
+from .cache import MemoryBackend, ReadThroughCache
+from .events import (
+    IMAGE_RESIZE_QUEUE,
+    PUBLISH_BUFFER_SIZE,
+    RABBITMQ_HOST,
+    RABBITMQ_PASSWORD,
+    RABBITMQ_USER,
+    SENTIMENT_CACHE_MAX_ENTRIES,
+    SENTIMENT_CACHE_TTL_SECONDS,
+    SENTIMENT_LABELS,
+    SENTIMENT_RPC_QUEUE,
+    TEXTGEN_QUEUE,
+    _disabled,
+    image_resize_body,
+    sentiment_cache_key,
+    sentiment_request_body,
+    textgen_job_body,
+)
+
+
+# AMQP-Transport der API: läuft direkt auf dem Event-Loop (aio-pika).
+# Konfiguration und Message-Bodies kommen aus events.py.
+AMQP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AMQP_CONNECT_TIMEOUT_SECONDS", "5"))
+SENTIMENT_RPC_TIMEOUT_SECONDS = float(os.getenv("SENTIMENT_RPC_TIMEOUT_SECONDS", "5"))
+# Verbinden + Publish + Broker-Confirm zusammen
+AMQP_PUBLISH_TIMEOUT_SECONDS = float(os.getenv("AMQP_PUBLISH_TIMEOUT_SECONDS", "5"))
+
+# der einzige Cache für Sentiment-Urteile (Schlüssel: events.sentiment_cache_key);
+# gecacht werden nur eindeutige Labels, nie Timeouts oder Fehler
+SENTIMENT_VERDICTS = ReadThroughCache(MemoryBackend(SENTIMENT_CACHE_MAX_ENTRIES), SENTIMENT_CACHE_TTL_SECONDS)
+
+
+def _amqp_url() -> str:
+    host = os.getenv("RABBITMQ_HOST", RABBITMQ_HOST)
+    user = quote(os.getenv("RABBITMQ_USER", RABBITMQ_USER), safe="")
+    pw = quote(os.getenv("RABBITMQ_PASSWORD", RABBITMQ_PASSWORD), safe="")
+    return f"amqp://{user}:{pw}@{host}/?heartbeat=30"
+
+
+class AmqpTransport:
+    """
+    Eine (robuste, selbst wiederverbindende) AMQP-Verbindung pro Event-Loop:
+    - Publish-Channel mit Publisher Confirms; parallele Publishes laufen gepipelined,
+      der Broker bestätigt sie gesammelt
+    - Queues werden einmal deklariert, nicht pro Nachricht
+    - RPC: eine exklusive Reply-Queue, correlation_id -> Future
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._publish_channel = None
+        self._rpc_channel = None
+        self._reply_queue = None
+        self._declared: set[str] = set()
+        self._pending: dict[str, asyncio.Future] = {}
+        self._background: set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+        self.dropped = 0
+
+    async def connect(self) -> None:
+        if self._connection is not None and not self._connection.is_closed:
+            return
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed:
+                return
+            connection = await aio_pika.connect_robust(_amqp_url(), timeout=AMQP_CONNECT_TIMEOUT_SECONDS)
+            try:
+                self._publish_channel = await connection.channel(publisher_confirms=True)
+                self._rpc_channel = await connection.channel(publisher_confirms=False)
+                self._reply_queue = await self._rpc_channel.declare_queue(exclusive=True, auto_delete=True)
+                await self._reply_queue.consume(self._on_reply, no_ack=True)
+            except BaseException:
+                await connection.close()
+                raise
+            self._declared.clear()
+            self._connection = connection
+
+    async def _on_reply(self, message) -> None:
+        future = self._pending.get(message.correlation_id)
+        if future is not None and not future.done():
+            future.set_result(message.body)
+        # späte Antworten (Aufrufer hat schon aufgegeben) werden verworfen
+
+    async def publish(
+        self, routing_key: str, body: bytes, timeout_seconds: float = AMQP_PUBLISH_TIMEOUT_SECONDS
+    ) -> None:
+        """Wartet auf das Broker-Confirm, wirft bei Fehlern und TimeoutError, wenn der Broker hängt."""
+        try:
+            await asyncio.wait_for(self._publish(routing_key, body), timeout_seconds)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Publish to {routing_key} not confirmed in time") from None
+
+    async def _publish(self, routing_key: str, body: bytes) -> None:
+        await self.connect()
+        if routing_key not in self._declared:
+            await self._publish_channel.declare_queue(routing_key, durable=True)
+            self._declared.add(routing_key)
+        await self._publish_channel.default_exchange.publish(
+            aio_pika.Message(body, delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+            routing_key=routing_key,
+        )
+
+    def spawn_publish(self, routing_key: str, body: bytes) -> bool:
+        """Fire-and-forget; höchstens PUBLISH_BUFFER_SIZE offene Publishes."""
+        if len(self._background) >= PUBLISH_BUFFER_SIZE:
+            self.dropped += 1
+            print(f"[events] too many pending publishes, dropping message for {routing_key}")
+            return False
+        task = asyncio.get_running_loop().create_task(self._publish_quietly(routing_key, body))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return True
+
+    async def _publish_quietly(self, routing_key: str, body: bytes) -> None:
+        try:
+            await self.publish(routing_key, body)
+        except Exception as exc:
+            print(f"[events] publish to {routing_key} failed: {exc}")
+
+    async def call(self, payload: bytes, timeout_seconds: float = SENTIMENT_RPC_TIMEOUT_SECONDS) -> bytes:
+        await self.connect()
+        corr_id = str(uuid.uuid4())
+        future = asyncio.get_running_loop().create_future()
+        self._pending[corr_id] = future
+        try:
+            await self._rpc_channel.default_exchange.publish(
+                aio_pika.Message(
+                    payload,
+                    correlation_id=corr_id,
+                    reply_to=self._reply_queue.name,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                ),
+                routing_key=SENTIMENT_RPC_QUEUE,
+            )
+            try:
+                return await asyncio.wait_for(future, timeout_seconds)
+            except asyncio.TimeoutError:
+                raise TimeoutError("Sentiment RPC timed out (service offline?)") from None
+        finally:
+            self._pending.pop(corr_id, None)
+
+    async def close(self, timeout_seconds: float = 5.0) -> None:
+        if self._background:
+            await asyncio.wait(set(self._background), timeout=timeout_seconds)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("AMQP transport closed"))
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            await connection.close()
+
+
+# Wie die Async-Engine: Verbindungen sind an ihren Loop gebunden.
+_TRANSPORTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AmqpTransport]" = weakref.WeakKeyDictionary()
+
+
+def get_transport() -> AmqpTransport:
+    loop = asyncio.get_running_loop()
+    transport = _TRANSPORTS.get(loop)
+    if transport is None:
+        transport = AmqpTransport()
+        _TRANSPORTS[loop] = transport
+    return transport
+
+
+async def start_events() -> None:
+    """App-Start: Verbindung früh aufbauen. Schlägt das fehl, wird beim ersten Event erneut verbunden."""
+    if _disabled():
+        return
+    try:
+        await get_transport().connect()
+    except Exception as exc:
+        print(f"[events] AMQP not reachable at startup: {exc}")
+
+
+async def stop_events() -> None:
+    """App-Shutdown: offene Publishes abwarten, Verbindung(en) schließen."""
+    transport = _TRANSPORTS.pop(asyncio.get_running_loop(), None)
+    if transport is not None:
+        await transport.close()
+
+
+# -----------------------------------------------------------------------------
+# Events / RPC
+# -----------------------------------------------------------------------------
+def publish_image_resize(post_id: int, image: str) -> None:
+    """Fire-and-forget, blockiert nie (muss auf dem Event-Loop aufgerufen werden)."""
+    if _disabled():
+        return
+    get_transport().spawn_publish(IMAGE_RESIZE_QUEUE, image_resize_body(post_id, image))
+
+
+async def publish_textgen_job(job_id: int, prompt: str, max_new_tokens: int = 60) -> None:
+    """Wartet auf das Broker-Confirm; wirft bei Fehlern (API setzt den Job dann auf error)."""
+    if _disabled():
+        return
+    await get_transport().publish(TEXTGEN_QUEUE, textgen_job_body(job_id, prompt, max_new_tokens))
+
+
+async def publish_confirmed(
+    routing_key: str, body: bytes, timeout_seconds: float = AMQP_PUBLISH_TIMEOUT_SECONDS
+) -> None:
+    """Ein fertiger Message-Body (z.B. aus der Outbox); kehrt erst nach dem Broker-Confirm zurück."""
+    await get_transport().publish(routing_key, body, timeout_seconds)
+
+
+async def _rpc_verdict(text: str) -> Optional[str]:
+    body = await get_transport().call(sentiment_request_body(text))
+    verdict = json.loads(body.decode("utf-8")).get("sentiment")
+    # nur eindeutige Antworten landen im Cache (None wird nicht gecacht)
+    return verdict if verdict in SENTIMENT_LABELS else None
+
+
+async def check_sentiment_rpc(text: str) -> str:
+    """
+    Sentiment-Check per RPC auf dem Event-Loop.
+    - Queues deaktiviert -> Neutral
+    - gleiche (normalisierte) Texte kommen aus SENTIMENT_VERDICTS, laufende Checks werden geteilt
+    """
+    if _disabled():
+        return "Neutral"
+    verdict = await SENTIMENT_VERDICTS.get_or_load(sentiment_cache_key(text), lambda: _rpc_verdict(text))
+    return verdict or "Neutral"
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import AsyncIterable, Iterable, Iterator, AsyncIterator
+
+
+# Reihenfolge muss zu db._export_stmt passen
+EXPORT_COLUMNS = ("id", "user", "text", "image", "image_small", "created_at")
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# so viele Zeilen pro Chunk zusammenfassen, statt pro Zeile ein write()/send()
+ROWS_PER_CHUNK = 500
+
+
+def _record(row) -> dict:
+    record = dict(zip(EXPORT_COLUMNS, row))
+    if record["created_at"] is not None:
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+def _ndjson_chunk(rows: list) -> str:
+    return "".join(json.dumps(_record(r), ensure_ascii=False) + "\n" for r in rows)
+
+
+def _csv_chunk(rows: list, header: bool) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for r in rows:
+        record = _record(r)
+        writer.writerow(record[c] for c in EXPORT_COLUMNS)
+    return buf.getvalue()
+
+
+class _Chunker:
+    def __init__(self, fmt: str):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown export format: {fmt!r} (expected one of {sorted(EXPORT_FORMATS)})")
+        self.fmt = fmt
+        self.header_pending = fmt == "csv"
+
+    def render(self, rows: list) -> str:
+        if self.fmt == "ndjson":
+            return _ndjson_chunk(rows)
+        chunk = _csv_chunk(rows, header=self.header_pending)
+        self.header_pending = False
+        return chunk
+
+
+def render_export(rows: Iterable, fmt: str) -> Iterator[str]:
+    """Formatiert einen (sync) Row-Stream in Text-Chunks – für die CLI."""
+    chunker = _Chunker(fmt)
+    batch: list = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield chunker.render(batch)
+            batch = []
+    if batch or chunker.header_pending:
+        yield chunker.render(batch)
+
+
+async def render_export_async(rows: AsyncIterable, fmt: str) -> AsyncIterator[bytes]:
+    """Wie render_export(), aber für den async Row-Stream des Endpoints."""
+    chunker = _Chunker(fmt)
+    batch: list = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield chunker.render(batch).encode("utf-8")
+            batch = []
+    if batch or chunker.header_pending:
+        yield chunker.render(batch).encode("utf-8")
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .uploads import ReceivedUpload
+
+
+IMAGES_URL_PREFIX = "/images/"
+ORIGINALS_DIR = "original"
+THUMBS_DIR = "thumbs"
+TMP_DIR = ".tmp"
+
+# Inhaltsadressierte Dateien ändern sich nie -> dürfen beliebig lange gecacht werden
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_CONTENT_ADDRESSED = re.compile(
+    rf"/(?:{ORIGINALS_DIR}|{THUMBS_DIR})/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.[a-z0-9]+$"
+)
+
+
+def is_content_addressed(url_or_path: str) -> bool:
+    return _CONTENT_ADDRESSED.search(url_or_path.replace("\\", "/")) is not None
+
+
+def content_relpath(sha256: str, suffix: str, kind: str = ORIGINALS_DIR) -> str:
+    """original/ab/cd/<sha256>.png – zwei Ebenen Fan-out halten Verzeichnisse klein."""
+    return f"{kind}/{sha256[:2]}/{sha256[2:4]}/{sha256}{suffix}"
+
+
+def thumb_url_for(image_url: str) -> str:
+    """Gleiche Ableitung wie im image_resizer: original/ -> thumbs/."""
+    return image_url.replace(f"/{ORIGINALS_DIR}/", f"/{THUMBS_DIR}/", 1)
+
+
+def file_sha256(path: Path, chunk_bytes: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """
+    Inhaltsadressierter Bildspeicher unter IMAGES_DIR.
+    Gleiche Bytes => gleicher Pfad => wird nur einmal gespeichert.
+    Wer eine Datei noch braucht, zählt die Tabelle image_ref (siehe db.py).
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    @property
+    def tmp_dir(self) -> Path:
+        return self.root / TMP_DIR
+
+    def url_to_path(self, url: str) -> Path:
+        rel = url[len(IMAGES_URL_PREFIX):] if url.startswith(IMAGES_URL_PREFIX) else url.lstrip("/")
+        path = (self.root / rel).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"image url outside of store: {url!r}")
+        return path
+
+    def url_for(self, upload: ReceivedUpload) -> str:
+        """URL, unter der put() den Upload ablegen wird (steht schon vor dem Ablegen fest)."""
+        return IMAGES_URL_PREFIX + content_relpath(upload.sha256, upload.suffix)
+
+    def put(self, upload: ReceivedUpload) -> str:
+        """Übernimmt eine temporäre Upload-Datei und gibt die (unveränderliche) URL zurück."""
+        rel = content_relpath(upload.sha256, upload.suffix)
+        return self._place(upload.path, rel, move=True)
+
+    def put_file(self, path: Path, kind: str = ORIGINALS_DIR, sha256: str | None = None) -> str:
+        """Kopiert eine bestehende Datei in den Store (für die Migration alter Dateien)."""
+        rel = content_relpath(sha256 or file_sha256(path), path.suffix.lower(), kind)
+        return self._place(path, rel, move=False)
+
+    def _place(self, src: Path, rel: str, *, move: bool) -> str:
+        dest = self.root / rel
+        if dest.exists():
+            # Dedup: Inhalt ist schon da
+            if move:
+                src.unlink(missing_ok=True)
+        else:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if move:
+                os.replace(src, dest)
+            else:
+                tmp = self.tmp_dir / f"{dest.name}.{os.getpid()}.part"
+                tmp.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, tmp)
+                os.replace(tmp, dest)
+        return IMAGES_URL_PREFIX + rel
+
+    def remove(self, *urls: str) -> None:
+        """Löscht nicht mehr referenzierte Dateien (Original + Thumbnail)."""
+        for url in urls:
+            try:
+                self.url_to_path(url).unlink(missing_ok=True)
+            except (OSError, ValueError) as exc:
+                print(f"[images] could not remove {url}: {exc}")
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles, das inhaltsadressierte Dateien mit Cache-Control: immutable ausliefert."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if response.status_code == 200 and is_content_addressed(str(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+# -----------------------------------------------------------------------------
+# Migration alter Dateien (original/<timestamp>_<user>.png) in den Store
+# -----------------------------------------------------------------------------
+_SELECT_POST_IMAGES = text("SELECT id, image, image_small FROM post ORDER BY id")
+_UPDATE_POST_IMAGES = text(
+    "UPDATE post SET image = :image, image_small = :image_small, updated_at = now() WHERE id = :id"
+)
+_REBUILD_REFCOUNTS = (
+    text("DELETE FROM image_ref"),
+    text("INSERT INTO image_ref (image, refcount) SELECT image, count(*) FROM post GROUP BY image"),
+)
+
+
+def migrate_legacy_images(engine: Engine, store: ImageStore, *, dry_run: bool = False, batch_size: int = 500) -> dict:
+    """
+    Verschiebt Bilder mit altem Namensschema in den inhaltsadressierten Store,
+    biegt post.image / post.image_small um, baut image_ref neu auf und löscht
+    danach die alten Dateien. Idempotent – bereits migrierte Posts werden übersprungen.
+    """
+    stats = {"posts": 0, "migrated": 0, "deduplicated": 0, "missing": 0}
+    moved: dict[str, str] = {}  # alte URL -> neue URL (mehrere Posts können dieselbe Datei haben)
+    legacy_files: set[Path] = set()
+    updates: list[dict] = []
+
+    def flush() -> None:
+        if updates and not dry_run:
+            with engine.begin() as conn:
+                conn.execute(_UPDATE_POST_IMAGES, updates)
+        updates.clear()
+
+    with engine.connect() as read_conn:
+        rows = read_conn.execution_options(yield_per=batch_size).execute(_SELECT_POST_IMAGES)
+        for post_id, image, image_small in rows:
+            stats["posts"] += 1
+            if is_content_addressed(image):
+                continue
+
+            new_image = moved.get(image)
+            if new_image is None:
+                try:
+                    path = store.url_to_path(image)
+                except ValueError:
+                    path = None
+                if path is None or not path.is_file():
+                    stats["missing"] += 1
+                    continue
+                digest = file_sha256(path)
+                rel = content_relpath(digest, path.suffix.lower())
+                if (store.root / rel).exists():
+                    stats["deduplicated"] += 1
+                new_image = IMAGES_URL_PREFIX + rel if dry_run else store.put_file(path, sha256=digest)
+                moved[image] = new_image
+                legacy_files.add(path)
+
+            new_small = image_small
+            if image_small and not is_content_addressed(image_small):
+                try:
+                    thumb_path = store.url_to_path(image_small)
+                except ValueError:
+                    thumb_path = None
+                if thumb_path is not None and thumb_path.is_file():
+                    new_small = thumb_url_for(new_image)
+                    if not dry_run and not store.url_to_path(new_small).exists():
+                        store._place(thumb_path, new_small[len(IMAGES_URL_PREFIX):], move=False)
+                    legacy_files.add(thumb_path)
+
+            updates.append({"id": post_id, "image": new_image, "image_small": new_small})
+            stats["migrated"] += 1
+            if len(updates) >= batch_size:
+                flush()
+        flush()
+
+    if not dry_run:
+        with engine.begin() as conn:
+            for stmt in _REBUILD_REFCOUNTS:
+                conn.execute(stmt)
+        # erst jetzt: alle Posts zeigen auf die neuen Pfade
+        for path in legacy_files:
+            path.unlink(missing_ok=True)
+
+    stats["legacy_files"] = len(legacy_files)
+    return stats
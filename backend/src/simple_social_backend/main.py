@@ -2,20 +2,21 @@ from __future__ import annotations
 
 import os
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
+from datetime import datetime
 from pathlib import Path
 from typing import List
 
 import requests
 from dotenv import load_dotenv, find_dotenv
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 
 from fastapi.concurrency import run_in_threadpool
 # from .events import publish_image_resize, publish_textgen_job
-from .events import publish_image_resize, publish_textgen_job, check_sentiment_rpc
+from .events_async import check_sentiment_rpc, start_events, stop_events
+from .outbox import start_outbox_relay, stop_outbox_relay, wake_outbox_relay
 
 # 2. ADD check_sentiment_rpc TO IMPORTS
 # try:
@@ -24,19 +25,28 @@ from .events import publish_image_resize, publish_textgen_job, check_sentiment_r
 #     from .events import publish_image_resize, publish_textgen_job
 #     check_sentiment_rpc = None
 
-from .db import (
-    init_db,
+from .db_async import (
+    dispose_async_engine,
     add_post,
     get_latest_post,
-    get_all_posts,
+    get_posts_page_rows,
+    get_post_table_version,
+    iter_posts_for_export,
     get_post_by_id,
     search_posts,
     delete_post as delete_post_from_db,
+    reclaim_orphaned_images,
     set_post_thumbnail,
     create_textgen_job,
     get_textgen_job,
     set_textgen_job_result,
 )
+from .etag import collection_etag, not_modified, post_etag
+from .export import EXPORT_FORMATS, render_export_async
+from .serialize import FastJSONResponse, rows_to_json
+from .image_store import IMMUTABLE_CACHE_CONTROL, ImageStore, ImmutableStaticFiles, is_content_addressed
+from .uploads import MAX_UPLOAD_BYTES, UploadRejected, UploadSizeLimitMiddleware, receive_upload
+from .variants import VARIANT_CACHE_DIR, VARIANT_CACHE_MAX_BYTES, VariantCache
 import asyncio
 import httpx
 
@@ -76,8 +86,14 @@ class ThumbnailIn(BaseModel):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    # Schema-Migrationen laufen separat (`social-migrate`), kein DDL beim Start.
+    await start_events()
+    await start_outbox_relay()
+    await run_in_threadpool(VARIANTS.scan)
     yield
+    await stop_outbox_relay()
+    await stop_events()
+    await dispose_async_engine()
 
 
 app = FastAPI(
@@ -90,7 +106,10 @@ app = FastAPI(
 DEFAULT_IMAGES = (Path(__file__).resolve().parents[3] / "images")
 IMAGES_DIR = Path(os.getenv("IMAGES_DIR", str(DEFAULT_IMAGES))).resolve()
 
-app.mount("/images", StaticFiles(directory=str(IMAGES_DIR), check_dir=False), name="images")
+IMAGE_STORE = ImageStore(IMAGES_DIR)
+VARIANTS = VariantCache(VARIANT_CACHE_DIR, VARIANT_CACHE_MAX_BYTES)
+
+app.mount("/images", ImmutableStaticFiles(directory=str(IMAGES_DIR), check_dir=False), name="images")
 
 origins = [
     "http://127.0.0.1:5500",
@@ -102,7 +121,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Link"],
 )
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
 
 # SENTIMENT_SERVICE_URL = os.getenv("SENTIMENT_SERVICE_URL", "http://sentiment-analysis:8001/predict")
 
@@ -111,32 +132,28 @@ app.add_middleware(
 # TextGenJob endpoints
 # ----------------------------
 @app.post("/textgen/jobs", response_model=TextGenJobOut)
-def start_textgen_job(payload: TextGenSuggestRequest):
+async def start_textgen_job(payload: TextGenSuggestRequest):
     prompt = payload.prompt.strip()
     if not prompt:
         raise HTTPException(status_code=400, detail="prompt is empty")
 
-    job = create_textgen_job(prompt=prompt, max_new_tokens=payload.max_new_tokens)
-    try:
-        publish_textgen_job(job_id=job["id"], prompt=prompt, max_new_tokens=payload.max_new_tokens)
-    except Exception as exc:
-        set_textgen_job_result(job_id=job["id"], status="error", generated_text=None, error=str(exc))
-        raise
-
+    # Job + Event in einer Transaktion (Outbox); veröffentlicht wird vom Relay
+    job = await create_textgen_job(prompt=prompt, max_new_tokens=payload.max_new_tokens)
+    wake_outbox_relay()
     return job
 
 
 @app.get("/textgen/jobs/{job_id}", response_model=TextGenJobOut)
-def read_textgen_job(job_id: int):
-    job = get_textgen_job(job_id)
+async def read_textgen_job(job_id: int):
+    job = await get_textgen_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="job not found")
     return job
 
 
 @app.put("/textgen/jobs/{job_id}", response_model=TextGenJobOut)
-def update_textgen_job(job_id: int, payload: TextGenJobResultIn):
-    updated = set_textgen_job_result(
+async def update_textgen_job(job_id: int, payload: TextGenJobResultIn):
+    updated = await set_textgen_job_result(
         job_id=job_id,
         status=payload.status,
         generated_text=payload.generated_text,
@@ -183,7 +200,7 @@ async def create_post(
     print(f"Checking sentiment for: {text}")
     try:
         # sentiment = check_sentiment_rpc(text) # This WAITS for the AI
-        sentiment = await run_in_threadpool(check_sentiment_rpc, text)
+        sentiment = await check_sentiment_rpc(text)
         print(f"Sentiment Result: {sentiment}")
         
         if sentiment == "Negative":
@@ -199,79 +216,180 @@ async def create_post(
         print(f"Sentiment Check Failed: {e}")
         # pass # Uncomment to allow posts even if AI is down
 
-    # 4. Save Image to Disk
-    base_dir = IMAGES_DIR / "original"
-    base_dir.mkdir(parents=True, exist_ok=True)
-
-    suffix = Path(image.filename).suffix or ".jpg"
-    timestamp = int(datetime.now(timezone.utc).timestamp())
-    filename = f"{timestamp}_{user}{suffix}"
-    file_path = base_dir / filename
+    # 4. Save Image to Disk (blockweise, im Threadpool, mit Größenlimit + Typprüfung)
+    if image.size is not None and image.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image too large (max {MAX_UPLOAD_BYTES} bytes)")
 
-    content = await image.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    try:
+        upload = await run_in_threadpool(receive_upload, image.file, IMAGE_STORE.tmp_dir)
+    except UploadRejected as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    finally:
+        await image.close()
 
-    image_url = f"/images/original/{filename}"
+    # inhaltsadressiert: gleiche Bytes -> gleiche (unveränderliche) URL, nur einmal auf Platte
+    image_url = IMAGE_STORE.url_for(upload)
 
-    # 5. Save Post to Database
-    post_id = add_post(image=str(image_url), text=text, user=user)
-    created = get_post_by_id(post_id)
+    # 5. Save Post to Database; die Datei wird erst abgelegt, wenn ihr Referenzzähler gesperrt ist,
+    #    und wieder entfernt, falls die Transaktion danach scheitert
+    try:
+        post_id = await add_post(
+            image=image_url, text=text, user=user, store=lambda: IMAGE_STORE.put(upload), remove=IMAGE_STORE.remove
+        )
+    finally:
+        # nach put() ist die temporäre Datei schon weg (verschoben oder als Duplikat gelöscht)
+        upload.path.unlink(missing_ok=True)
+    created = await get_post_by_id(post_id)
     if not created:
         raise HTTPException(status_code=500, detail="Post could not be created")
 
-    # 6. Trigger Image Resize (Async Background Task)
-    # We use asyncio.to_thread to run the blocking Pika publish function safely
-    # and create_task to ensure the API responds immediately without waiting.
-    try:
-        asyncio.create_task(asyncio.to_thread(publish_image_resize, post_id, created["image"]))
-    except Exception:
-        pass
+    # 6. Trigger Image Resize: das Event wurde mit dem Post committet (Outbox)
+    wake_outbox_relay()
 
     return created
 
 @app.get("/posts/latest", response_model=PostOut)
-def latest_post():
-    post = get_latest_post()
+async def latest_post(request: Request, response: Response):
+    post = await get_latest_post()
     if not post:
         raise HTTPException(status_code=404, detail="No posts found")
-    return post
+    return not_modified(request, response, post_etag(post)) or post
+
+
+def _set_next_cursor(request: Request, response: Response, next_cursor: str | None) -> None:
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+async def _paged_posts(request: Request, response: Response, user: str | None, limit: int | None, cursor: str | None):
+    """
+    Holt eine Seite Posts und setzt den Cursor für die nächste Seite als Header
+    (X-Next-Cursor + Link rel="next"), damit der Body eine Liste bleibt.
+    Das ETag kommt aus dem Änderungszähler der Tabelle – bei 304 gibt es keine Page-Query.
+    """
+    # Version VOR den Daten lesen: im Zweifel ist das ETag älter als der Inhalt, nie neuer
+    etag = collection_etag(request, await get_post_table_version())
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+
+    try:
+        rows, next_cursor = await get_posts_page_rows(user=user, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # Fast Path: Tupel -> JSON-Bytes, ohne PostOut-Validierung (response_model bleibt für /docs)
+    _set_next_cursor(request, response, next_cursor)
+    return FastJSONResponse(rows_to_json(rows), headers=dict(response.headers))
 
 
 @app.get("/posts", response_model=list[PostOut])
-def list_posts(user: str | None = None):
-    return get_all_posts(user=user)
+async def list_posts(
+    request: Request,
+    response: Response,
+    user: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+):
+    return await _paged_posts(request, response, user=user, limit=limit, cursor=cursor)
 
 
 @app.get("/posts/search", response_model=list[PostOut])
-def search(query: str):
-    return search_posts(query=query)
+async def search(
+    request: Request,
+    response: Response,
+    query: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+):
+    try:
+        posts, next_cursor = await search_posts(query=query, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    _set_next_cursor(request, response, next_cursor)
+    return posts
+
+
+@app.get("/posts/export", summary="Stream all posts as NDJSON or CSV")
+async def export_posts(
+    format: str = "ndjson",
+    user: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """
+    Bulk-Export für Analytics: streamt per Server-Side-Cursor, Speicher bleibt
+    unabhängig von der Tabellengröße flach. Filter: user, since <= created_at < until.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}")
+
+    rows = iter_posts_for_export(user=user, since=since, until=until)
+    return StreamingResponse(
+        render_export_async(rows, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="posts.{format}"'},
+    )
 
 
 @app.get("/posts/{post_id}", response_model=PostOut)
-def get_post(post_id: int):
-    post = get_post_by_id(post_id)
+async def get_post(request: Request, response: Response, post_id: int):
+    post = await get_post_by_id(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    return not_modified(request, response, post_etag(post)) or post
 
 
 @app.put("/posts/{post_id}/thumbnail", response_model=PostOut)
-def update_thumbnail(post_id: int, payload: ThumbnailIn):
-    updated = set_post_thumbnail(post_id, payload.image_small)
+async def update_thumbnail(post_id: int, payload: ThumbnailIn):
+    updated = await set_post_thumbnail(post_id, payload.image_small)
     if not updated:
         raise HTTPException(status_code=404, detail="Post not found")
     return updated
 
 
 @app.get("/users/{user}/posts", response_model=List[PostOut])
-def list_user_posts(user: str):
-    return get_all_posts(user=user)
+async def list_user_posts(
+    request: Request,
+    response: Response,
+    user: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+):
+    return await _paged_posts(request, response, user=user, limit=limit, cursor=cursor)
 
 
 @app.delete("/posts/{post_id}", status_code=204)
-def delete_post(post_id: int):
-    deleted = delete_post_from_db(post_id)
-    if not deleted:
+async def delete_post(post_id: int):
+    orphaned = await delete_post_from_db(post_id)
+    if orphaned is None:
         raise HTTPException(status_code=404, detail="Post not found")
+    if orphaned:
+        # prüft den Zähler unter Zeilensperre erneut – ein paralleler Upload kann das Bild wieder brauchen
+        await reclaim_orphaned_images(orphaned, IMAGE_STORE.remove)
     return
+
+
+@app.get("/variants/{image_path:path}")
+async def image_variant(image_path: str, w: int | None = None, fmt: str | None = None):
+    """
+    Skalierte/umkodierte Variante eines Bildes, z.B. /variants/original/ab/cd/<sha>.png?w=640&fmt=webp.
+    Wird einmal erzeugt, liegt dann im LRU-Plattencache und wird per FileResponse ausgeliefert.
+    """
+    try:
+        src = IMAGE_STORE.url_to_path(image_path)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not src.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    try:
+        path, media_type = await VARIANTS.get(src, width=w, fmt=fmt)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # image_path kommt ohne führenden "/" aus der Route
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_addressed("/" + image_path) else "public, max-age=3600"
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": cache_control})
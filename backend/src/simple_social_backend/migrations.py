@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+from . import models  # noqa: F401  (registriert die Tabellen in SQLModel.metadata)
+
+
+# beliebige, aber feste Zahl für pg_advisory_lock – verhindert parallele Migrationen
+MIGRATION_LOCK_KEY = 724_311_001
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Eine Schema-Migration.
+
+    - statements: rohes SQL, wird der Reihe nach ausgeführt
+    - apply: optional Python-Code mit der Connection (z.B. create_all)
+    - concurrent: True => läuft im AUTOCOMMIT-Modus (nötig für CREATE INDEX CONCURRENTLY)
+    """
+    version: int
+    name: str
+    statements: tuple[str, ...] = ()
+    apply: Callable[[Connection], None] | None = None
+    concurrent: bool = False
+
+
+def _create_tables(conn: Connection) -> None:
+    # checkfirst=True: bestehende Deployments (früher create_all beim Start) bleiben unangetastet
+    SQLModel.metadata.create_all(conn, checkfirst=True)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "initial_tables", apply=_create_tables),
+    Migration(
+        2,
+        "hot_path_indexes",
+        statements=(
+            # GET /posts: neueste zuerst, Keyset auf (created_at, id)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_post_created_at_id "
+            "ON post (created_at DESC, id DESC)",
+            # GET /users/{user}/posts und /posts?user=...
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_post_user_created_at_id '
+            'ON post ("user", created_at DESC, id DESC)',
+            # Volltextsuche – Ausdruck muss search.post_text_tsvector() entsprechen
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_post_text_fts "
+            "ON post USING GIN (to_tsvector('german'::regconfig, text))",
+            # Jobs nach Status (pending/done/error), älteste zuerst
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_textgenjob_status_created_at "
+            "ON textgenjob (status, created_at)",
+        ),
+        concurrent=True,
+    ),
+    Migration(
+        3,
+        "post_versions_for_etags",
+        statements=(
+            "ALTER TABLE post ADD COLUMN IF NOT EXISTS updated_at timestamp",
+            "UPDATE post SET updated_at = created_at WHERE updated_at IS NULL",
+            # Änderungszähler pro Tabelle. Hat alle Schreiber auf post über die eine Zeile
+            # serialisiert -> Trigger zählt seit Migration 6 eine Sequence hoch.
+            "CREATE TABLE IF NOT EXISTS table_versions ("
+            " name text PRIMARY KEY,"
+            " version bigint NOT NULL DEFAULT 0)",
+            "INSERT INTO table_versions (name, version) VALUES ('post', 0) ON CONFLICT DO NOTHING",
+            "CREATE OR REPLACE FUNCTION bump_post_version() RETURNS trigger AS $$ "
+            "BEGIN UPDATE table_versions SET version = version + 1 WHERE name = 'post'; RETURN NULL; END; "
+            "$$ LANGUAGE plpgsql",
+            "DROP TRIGGER IF EXISTS post_bump_version ON post",
+            "CREATE TRIGGER post_bump_version AFTER INSERT OR UPDATE OR DELETE ON post "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_post_version()",
+        ),
+    ),
+    Migration(
+        4,
+        "image_refcounts",
+        statements=(
+            # Referenzzähler für den inhaltsadressierten Bildspeicher (image_store.py)
+            "CREATE TABLE IF NOT EXISTS image_ref ("
+            " image text PRIMARY KEY,"
+            " refcount integer NOT NULL)",
+            "INSERT INTO image_ref (image, refcount) "
+            "SELECT image, count(*) FROM post GROUP BY image "
+            "ON CONFLICT (image) DO NOTHING",
+        ),
+    ),
+    Migration(
+        5,
+        "event_outbox",
+        statements=(
+            # Transactional Outbox: Events entstehen in derselben Transaktion wie Post/Job,
+            # der Relay (outbox.py) veröffentlicht sie und löscht sie nach dem Broker-Confirm
+            "CREATE TABLE IF NOT EXISTS event_outbox ("
+            " id bigserial PRIMARY KEY,"
+            " queue text NOT NULL,"
+            " body bytea NOT NULL,"
+            " attempts integer NOT NULL DEFAULT 0,"
+            " created_at timestamptz NOT NULL DEFAULT now(),"
+            " available_at timestamptz NOT NULL DEFAULT now())",
+            "CREATE INDEX IF NOT EXISTS ix_event_outbox_available_at_id ON event_outbox (available_at, id)",
+        ),
+    ),
+    Migration(
+        6,
+        "post_version_sequence",
+        statements=(
+            # Änderungszähler für Listen-ETags als Sequence: nextval() nimmt keine Zeilensperre,
+            # parallele Schreiber auf post warten nicht mehr aufeinander (vorher: UPDATE auf die
+            # eine Zeile table_versions('post') bis zum Commit).
+            # Preis: nextval() ist nicht transaktional. Ein Leser kann den neuen Wert sehen, bevor
+            # der Schreiber committed hat, und die alte Seite unter dem neuen ETag bekommen – bis
+            # zum nächsten Schreibzugriff. Das Fenster ist der Rest der schreibenden Transaktion
+            # (wenige ms); Abbrüche verbrauchen nur eine Nummer.
+            "CREATE SEQUENCE IF NOT EXISTS post_version_seq",
+            # dort weiterzählen, wo table_versions stand – alte ETags dürfen nie wieder passen
+            "SELECT setval('post_version_seq', "
+            "greatest((SELECT version FROM table_versions WHERE name = 'post'), 0) + 1)",
+            "CREATE OR REPLACE FUNCTION bump_post_version() RETURNS trigger AS $$ "
+            "BEGIN PERFORM nextval('post_version_seq'); RETURN NULL; END; "
+            "$$ LANGUAGE plpgsql",
+        ),
+    ),
+    Migration(
+        7,
+        "event_outbox_dead_letter",
+        statements=(
+            # nach OUTBOX_MAX_ATTEMPTS Fehlversuchen gibt der Relay auf: Zeile bleibt zur Analyse
+            # stehen (failed_at gesetzt), wird aber nicht mehr geclaimt
+            "ALTER TABLE event_outbox ADD COLUMN IF NOT EXISTS failed_at timestamptz",
+            "CREATE INDEX IF NOT EXISTS ix_event_outbox_pending ON event_outbox (available_at, id) "
+            "WHERE failed_at IS NULL",
+            "DROP INDEX IF EXISTS ix_event_outbox_available_at_id",
+        ),
+    ),
+]
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version integer PRIMARY KEY,"
+        " name text NOT NULL,"
+        " applied_at timestamptz NOT NULL DEFAULT now())"
+    ))
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+_CONCURRENT_INDEX_RE = re.compile(r"CREATE\s+INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+def _drop_invalid_indexes(conn: Connection, statements: tuple[str, ...]) -> None:
+    """
+    Ein abgebrochenes CREATE INDEX CONCURRENTLY hinterlässt einen INVALID-Index, den
+    IF NOT EXISTS beim nächsten Lauf überspringen würde -> vorher wegräumen.
+    (Ein Build, der gerade noch läuft, ist ausgeschlossen: Migrationen halten den Advisory-Lock.)
+    """
+    names = [m.group(1) for stmt in statements if (m := _CONCURRENT_INDEX_RE.search(stmt))]
+    if not names:
+        return
+    invalid = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relname = ANY(:names) AND pg_table_is_visible(c.oid)"
+        ),
+        {"names": names},
+    ).scalars().all()
+    for name in invalid:
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def _run(engine: Engine, migration: Migration) -> None:
+    if migration.concurrent:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            _drop_invalid_indexes(conn, migration.statements)
+            for stmt in migration.statements:
+                conn.execute(text(stmt))
+            if migration.apply is not None:
+                migration.apply(conn)
+        with engine.begin() as conn:
+            _record(conn, migration)
+        return
+
+    with engine.begin() as conn:
+        for stmt in migration.statements:
+            conn.execute(text(stmt))
+        if migration.apply is not None:
+            migration.apply(conn)
+        _record(conn, migration)
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n) ON CONFLICT DO NOTHING"),
+        {"v": migration.version, "n": migration.name},
+    )
+
+
+def migrate(engine: Engine) -> list[Migration]:
+    """
+    Spielt alle noch fehlenden Migrationen in Versionsreihenfolge ein.
+    Ein Advisory-Lock sorgt dafür, dass parallel startende Container nicht gleichzeitig migrieren.
+    Gibt die neu angewendeten Migrationen zurück.
+    """
+    applied: list[Migration] = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": MIGRATION_LOCK_KEY})
+        try:
+            done = applied_versions(engine)
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in done:
+                    continue
+                _run(engine, migration)
+                applied.append(migration)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MIGRATION_LOCK_KEY})
+    return applied
@@ -5,6 +5,7 @@ from sqlmodel import SQLModel, Field
 
 
 class Post(SQLModel, table=True):
+    # Indizes werden in migrations.py angelegt (CONCURRENTLY), nicht hier.
     id: int | None = Field(default=None, primary_key=True)
 
     image: str
@@ -13,6 +14,8 @@ class Post(SQLModel, table=True):
     text: str
     user: str
     created_at: datetime | None = Field(default=None)
+    # Versionsmarker für ETags – bei jeder Änderung am Post neu setzen
+    updated_at: datetime | None = Field(default=None)
 
     # optional: falls du nach dem Posten auch noch TextGen speichern willst
     generated_text: str | None = None
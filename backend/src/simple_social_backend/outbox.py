@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Optional
+
+from sqlalchemy import text
+
+from .db_async import get_async_engine
+from .events import _disabled
+from .events_async import publish_confirmed
+
+
+# Relay für die Transactional Outbox (Tabelle event_outbox, Migration 5).
+# Posts/Jobs und ihre Events werden gemeinsam committet (db.py / db_async.py);
+# hier werden die Events in Batches veröffentlicht und erst nach dem Confirm gelöscht.
+# Mehrere API-Instanzen können parallel laufen: FOR UPDATE SKIP LOCKED verteilt die Zeilen.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1.0"))
+OUTBOX_RETRY_SECONDS = float(os.getenv("OUTBOX_RETRY_SECONDS", "5"))
+# pro Event: so lange wird auf das Broker-Confirm gewartet (inkl. Verbindungsaufbau)
+OUTBOX_PUBLISH_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_PUBLISH_TIMEOUT_SECONDS", "10"))
+# danach wird ein Event nicht mehr veröffentlicht, sondern als fehlgeschlagen markiert (failed_at)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "20"))
+# geclaimte Zeilen sind so lange für andere Relays unsichtbar (Lease über available_at);
+# stirbt der Prozess mittendrin, werden sie danach erneut veröffentlicht (at-least-once)
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", str(max(30.0, 3 * OUTBOX_PUBLISH_TIMEOUT_SECONDS))))
+
+# Kurze Transaktion: Zeilen sperren, Lease setzen, committen. Veröffentlicht wird danach
+# ohne offene Transaktion – ein hängender Broker hält weder Sperren noch eine Pool-Verbindung.
+_CLAIM_SQL = text(
+    "UPDATE event_outbox SET available_at = now() + make_interval(secs => :lease) "
+    "WHERE id IN ("
+    " SELECT id FROM event_outbox WHERE available_at <= now() AND failed_at IS NULL "
+    " ORDER BY id LIMIT :limit FOR UPDATE SKIP LOCKED"
+    ") RETURNING id, queue, body"
+)
+_DELETE_SQL = text("DELETE FROM event_outbox WHERE id = ANY(:ids)")
+# lineares Backoff, gedeckelt bei 12 * OUTBOX_RETRY_SECONDS; nach :max_attempts Versuchen Dead Letter
+_RETRY_SQL = text(
+    "UPDATE event_outbox SET attempts = attempts + 1, "
+    "available_at = now() + make_interval(secs => :delay * LEAST(attempts + 1, 12)), "
+    "failed_at = CASE WHEN attempts + 1 >= :max_attempts THEN now() END "
+    "WHERE id = ANY(:ids) RETURNING id, failed_at IS NOT NULL AS dead"
+)
+
+
+async def relay_batch(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Veröffentlicht bis zu batch_size fällige Events (gleichzeitig, Confirms gesammelt)
+    und gibt die Anzahl der bestätigten zurück. Fehlgeschlagene bleiben mit Backoff liegen,
+    nach OUTBOX_MAX_ATTEMPTS Versuchen werden sie nicht mehr angefasst (failed_at).
+    """
+    engine = get_async_engine()
+    async with engine.begin() as conn:
+        rows = (await conn.execute(_CLAIM_SQL, {"limit": batch_size, "lease": OUTBOX_LEASE_SECONDS})).all()
+    if not rows:
+        return 0
+
+    rows.sort(key=lambda row: row.id)
+    results = await asyncio.gather(
+        *(publish_confirmed(queue, bytes(body), OUTBOX_PUBLISH_TIMEOUT_SECONDS) for _, queue, body in rows),
+        return_exceptions=True,
+    )
+    sent = [row.id for row, result in zip(rows, results) if not isinstance(result, BaseException)]
+    failed = [row.id for row, result in zip(rows, results) if isinstance(result, BaseException)]
+
+    async with engine.begin() as conn:
+        if sent:
+            await conn.execute(_DELETE_SQL, {"ids": sent})
+        if failed:
+            error = next(r for r in results if isinstance(r, BaseException))
+            print(f"[outbox] {len(failed)} of {len(rows)} events not confirmed, retrying later: {error}")
+            retried = await conn.execute(
+                _RETRY_SQL, {"ids": failed, "delay": OUTBOX_RETRY_SECONDS, "max_attempts": OUTBOX_MAX_ATTEMPTS}
+            )
+            dead = [row.id for row in retried if row.dead]
+            if dead:
+                print(f"[outbox] giving up on events {dead} after {OUTBOX_MAX_ATTEMPTS} attempts")
+    return len(sent)
+
+
+class OutboxRelay:
+    """
+    Hintergrund-Loop: leert die Outbox, solange volle Batches kommen, und wartet sonst
+    auf wake() (nach einem Commit in diesem Prozess) oder das Poll-Intervall.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.published = 0
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run(), name="outbox-relay")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake.set()
+        else:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                sent = await relay_batch(self.batch_size)
+            except Exception as exc:
+                print(f"[outbox] relay failed: {exc}")
+                sent = 0
+            self.published += sent
+            if sent >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+_relay: Optional[OutboxRelay] = None
+
+
+async def start_outbox_relay() -> None:
+    """App-Start (lifespan). Bei deaktivierten Queues gibt es keinen Relay (und keine neuen Outbox-Zeilen)."""
+    global _relay
+    if _disabled() or _relay is not None:
+        return
+    _relay = OutboxRelay()
+    _relay.start()
+
+
+async def stop_outbox_relay() -> None:
+    global _relay
+    relay, _relay = _relay, None
+    if relay is not None:
+        await relay.stop()
+
+
+def wake_outbox_relay() -> None:
+    """Nach dem Commit eines Events: sofort veröffentlichen statt erst beim nächsten Poll."""
+    if _relay is not None:
+        _relay.wake()
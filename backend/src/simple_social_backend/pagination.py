@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+from datetime import datetime
+
+
+# Server-seitige Obergrenze – Clients können nicht mehr anfordern.
+DEFAULT_PAGE_SIZE = int(os.getenv("POSTS_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("POSTS_PAGE_MAX", "100"))
+
+
+def clamp_limit(limit: int | None) -> int:
+    if limit is None or limit <= 0:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+
+
+def encode_cursor(created_at: datetime, post_id: int) -> str:
+    """
+    Opaker Cursor für Keyset-Pagination auf (created_at, id).
+    Der Client soll ihn nur zurückschicken, nicht interpretieren.
+    """
+    return _encode([created_at.isoformat(), post_id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Gegenstück zu encode_cursor(). Wirft ValueError bei kaputten Cursors.
+    """
+    try:
+        created_at, post_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except Exception as exc:
+        raise ValueError(f"invalid cursor: {cursor!r}") from exc
+
+
+def encode_search_cursor(rank: float, post_id: int) -> str:
+    """Cursor für die Suche: Keyset auf (rank, id), beides absteigend."""
+    return _encode([rank, post_id])
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank, post_id = _decode(cursor)
+        return float(rank), int(post_id)
+    except Exception as exc:
+        raise ValueError(f"invalid cursor: {cursor!r}") from exc
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+
+from sqlalchemy import and_, cast, func, literal_column, or_
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlmodel import select
+
+from .cache import TTLCache
+from .models import Post
+from .pagination import decode_search_cursor
+
+
+# Posts sind deutsch -> deutsche Stemming-Konfiguration.
+# Fest verdrahtet, weil der GIN-Index (migrations.py) denselben Wert benutzt.
+SEARCH_CONFIG = "german"
+
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "10"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+
+
+def post_text_tsvector():
+    """
+    Muss exakt dem Ausdruck des GIN-Index auf post.text entsprechen
+    (siehe migrations.py, ix_post_text_fts), sonst benutzt Postgres den Index nicht.
+    """
+    return func.to_tsvector(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), Post.text)
+
+
+def normalize_query(query: str) -> str:
+    """Kleinschreibung + zusammengefasste Leerzeichen, damit gleiche Suchen denselben Cache-Key haben."""
+    return " ".join(query.lower().split())
+
+
+def build_search_statement(query: str, limit: int, cursor: str | None = None):
+    """
+    Ranked Volltextsuche: liefert (Post, rank), sortiert nach rank desc, id desc.
+    websearch_to_tsquery verträgt beliebige Benutzereingaben ("...", -wort, OR).
+    """
+    ts_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query)
+    vector = post_text_tsvector()
+    # ts_rank_cd liefert real; der Cursor speichert den Rang als double. Sortieren und
+    # vergleichen daher auf float8, sonst trifft "rank = :last_rank" bei Rängen wie 0.1
+    # (float4 -> 0.10000000149...) nie und gleichrangige Treffer fallen von der nächsten Seite.
+    rank = cast(func.ts_rank_cd(vector, ts_query), DOUBLE_PRECISION)
+
+    stmt = select(Post, rank.label("rank")).where(vector.op("@@")(ts_query))
+    if cursor:
+        last_rank, last_id = decode_search_cursor(cursor)
+        stmt = stmt.where(or_(rank < last_rank, and_(rank == last_rank, Post.id < last_id)))
+    return stmt.order_by(rank.desc(), Post.id.desc()).limit(limit + 1)
+
+
+# Kurze TTL statt Invalidierung bei jedem Schreibzugriff
+SEARCH_CACHE = TTLCache(SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_MAX_ENTRIES)
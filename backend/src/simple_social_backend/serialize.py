@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Iterable, Sequence
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Spalten-Reihenfolge der Fast-Path-Selects (db._POST_OUT_COLUMNS) == Felder von PostOut
+POST_OUT_FIELDS = ("id", "image", "image_small", "text", "user", "created_at")
+
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+else:
+    _ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+    def dumps(obj: Any) -> bytes:
+        return _ENCODER.encode(obj).encode("utf-8")
+
+
+def rows_to_json(rows: Iterable[Sequence], fields: Sequence[str] = POST_OUT_FIELDS) -> bytes:
+    """
+    Row-Tupel direkt nach JSON – ohne ORM-Objekt, model_dump() und PostOut-Validierung.
+    Die Spalten kommen schon typisiert aus der DB, eine erneute Validierung bringt nichts.
+    """
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+class FastJSONResponse(Response):
+    """JSON-Response, die mit orjson (falls installiert) serialisiert."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import itertools
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from .models import Post
+
+
+# Bausteine für halbwegs realistische deutsche Posts (Stemming/Volltextsuche testen)
+_OPENERS = [
+    "Heute", "Gestern", "Endlich", "Am Wochenende", "Gerade eben", "Nach der Arbeit",
+    "Zum ersten Mal", "Wie jeden Morgen", "Trotz Regen", "Mit der Familie",
+]
+_ACTIVITIES = [
+    "ein Spaziergang am See", "Kaffee mit Freunden", "eine Radtour durch den Wald",
+    "veganes Mittagessen", "ein Konzert in der Altstadt", "Pizza selbst gemacht",
+    "die Katze beim Schlafen beobachtet", "ein neues Buch angefangen", "Sonnenuntergang am Strand",
+    "Wanderung in den Bergen", "Kuchen gebacken", "im Garten gearbeitet", "den Hund ausgeführt",
+]
+_COMMENTS = [
+    "einfach herrlich", "total entspannend", "richtig lecker", "sehr gemütlich",
+    "wunderschön", "ein bisschen anstrengend", "genau das Richtige", "absolut empfehlenswert",
+    "mal wieder viel zu kurz", "besser als erwartet",
+]
+_TAILS = ["", "", "😊", "😋", "☀️", "🐱", "🎉", "❤️", "#wochenende", "#natur", "#lecker", "#wien"]
+_SUFFIXES = [".jpg", ".png", ".webp"]
+
+
+def synthetic_text(rng: random.Random) -> str:
+    text = f"{rng.choice(_OPENERS)}: {rng.choice(_ACTIVITIES)} – {rng.choice(_COMMENTS)}!"
+    if rng.random() < 0.3:
+        text += f" Danach noch {rng.choice(_ACTIVITIES)}."
+    tail = rng.choice(_TAILS)
+    return f"{text} {tail}".rstrip()
+
+
+def generate_posts(
+    n_posts: int,
+    n_users: int,
+    *,
+    days: int = 365,
+    seed: int | None = None,
+    now: datetime | None = None,
+) -> Iterator[tuple]:
+    """
+    Erzeugt n_posts Zeilen (image, image_small, text, user, created_at, updated_at),
+    verteilt über n_users Benutzer und die letzten `days` Tage. Lazy – kein Riesen-Array im RAM.
+    Benutzer sind Zipf-ähnlich verteilt (wenige sehr aktive, viele stille).
+    """
+    if n_users < 1 or days < 1:
+        raise ValueError("n_users and days must be >= 1")
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    span_seconds = days * 24 * 3600
+    users = [f"user{i:06d}" for i in range(n_users)]
+    # kumulativ vorberechnen: choices() macht dann nur noch eine Binärsuche pro Post
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(n_users)))
+
+    for i in range(n_posts):
+        user = rng.choices(users, cum_weights=cum_weights)[0]
+        created_at = now - timedelta(seconds=rng.randrange(span_seconds), microseconds=rng.randrange(1_000_000))
+        name = f"{i:09d}_{user}{rng.choice(_SUFFIXES)}"
+        image = f"/images/original/{name}"
+        image_small = f"/images/thumbs/{name}" if rng.random() < 0.9 else None
+        yield (image, image_small, synthetic_text(rng), user, created_at, created_at)
+
+
+_COLUMNS = ("image", "image_small", "text", "user", "created_at", "updated_at")
+
+
+def copy_posts(engine: Engine, rows: Iterator[tuple], batch_size: int = 50_000) -> int:
+    """
+    Lädt Zeilen per COPY FROM STDIN (psycopg 3). Commit alle batch_size Zeilen,
+    damit ein Abbruch nicht alles zurückrollt und WAL/Locks überschaubar bleiben.
+    """
+    copy_sql = 'COPY post (image, image_small, text, "user", created_at, updated_at) FROM STDIN'
+    rows = iter(rows)  # wird über mehrere COPY-Batches hinweg weiterkonsumiert
+    total = 0
+    raw = engine.raw_connection()
+    try:
+        driver_conn = raw.driver_connection
+        while True:
+            written = 0
+            with driver_conn.cursor() as cur:
+                with cur.copy(copy_sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                        written += 1
+                        if written >= batch_size:
+                            break
+            driver_conn.commit()
+            total += written
+            if written < batch_size:
+                return total
+    finally:
+        raw.close()
+
+
+def insert_posts(engine: Engine, rows: Iterator[tuple], batch_size: int = 5_000) -> int:
+    """Fallback ohne COPY: executemany-Inserts in Batches (insertmanyvalues)."""
+    total = 0
+    batch: list[dict] = []
+    stmt = insert(Post.__table__)
+    for row in rows:
+        batch.append(dict(zip(_COLUMNS, row)))
+        if len(batch) >= batch_size:
+            with engine.begin() as conn:
+                conn.execute(stmt, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        with engine.begin() as conn:
+            conn.execute(stmt, batch)
+        total += len(batch)
+    return total
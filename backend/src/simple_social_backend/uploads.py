@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Spielraum für die übrigen Multipart-Felder (text, user, Boundaries)
+_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Magic Bytes -> Dateiendung. Reicht, um Nicht-Bilder abzulehnen, ohne zu dekodieren.
+_SIGNATURES: list[tuple[bytes, str]] = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+
+class UploadRejected(ValueError):
+    status_code = 400
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+class UnsupportedImageType(UploadRejected):
+    status_code = 415
+
+
+def detect_image_type(head: bytes) -> str | None:
+    """Dateiendung anhand der ersten Bytes, None wenn kein unterstütztes Bild."""
+    for signature, suffix in _SIGNATURES:
+        if head.startswith(signature):
+            return suffix
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+@dataclass(frozen=True)
+class ReceivedUpload:
+    path: Path      # temporäre Datei, wird vom ImageStore verschoben
+    suffix: str     # aus den Magic Bytes erkannt
+    sha256: str
+    size: int
+
+
+def receive_upload(src: BinaryIO, tmp_dir: Path, max_bytes: int | None = None) -> ReceivedUpload:
+    """
+    Kopiert einen Upload blockweise in eine temporäre Datei unter tmp_dir
+    und hasht dabei mit. Blockierend – vom Event-Loop aus über run_in_threadpool aufrufen.
+
+    - Typ wird aus dem Header erkannt (nicht aus dem Dateinamen)
+    - bricht ab, sobald max_bytes überschritten ist
+    - tmp_dir muss auf demselben Dateisystem wie der Store liegen (atomares rename)
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    head = src.read(16)
+    suffix = detect_image_type(head)
+    if suffix is None:
+        raise UnsupportedImageType("Unsupported image type (expected JPEG, PNG, GIF or WebP)")
+
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256(head)
+
+    written = len(head)
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(head)
+            while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Image too large (max {max_bytes} bytes)")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return ReceivedUpload(path=tmp_path, suffix=suffix, sha256=digest.hexdigest(), size=written)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Lehnt zu große Uploads schon anhand von Content-Length ab (413),
+    bevor der Multipart-Body überhaupt gelesen und gespoolt wird.
+    Chunked Uploads ohne Content-Length fängt store_upload() ab.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES, paths: tuple[str, ...] = ("/posts",)):
+        self.app = app
+        self.limit = max_bytes + _FORM_OVERHEAD_BYTES
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.paths:
+            length = Headers(scope=scope).get("content-length")
+            if length is not None and length.isdigit() and int(length) > self.limit:
+                response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Erlaubte Breiten – angefragte Breiten werden auf die nächstgrößere gerundet,
+# damit beliebige ?w=... den Cache nicht fluten können.
+VARIANT_WIDTHS = sorted(int(w) for w in os.getenv("VARIANT_WIDTHS", "160,320,640,1024,1600").split(","))
+VARIANT_CACHE_DIR = Path(os.getenv("VARIANT_CACHE_DIR", str(Path(tempfile.gettempdir()) / "simple-social-variants")))
+VARIANT_CACHE_MAX_BYTES = int(os.getenv("VARIANT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+VARIANT_QUALITY = int(os.getenv("VARIANT_QUALITY", "82"))
+
+# fmt -> (Pillow-Format, Dateiendung, Media-Type)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "jpg": ("JPEG", ".jpg", "image/jpeg"),
+    "png": ("PNG", ".png", "image/png"),
+}
+_SUFFIX_TO_FMT = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp"}
+
+
+def snap_width(width: int | None) -> int | None:
+    if width is None:
+        return None
+    if width <= 0:
+        raise ValueError("w must be positive")
+    for allowed in VARIANT_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return VARIANT_WIDTHS[-1]
+
+
+def render_variant(src: Path, dest: Path, width: int | None, fmt: str) -> None:
+    """Blockierend (Pillow) – nur im Threadpool aufrufen. Schreibt atomar nach dest."""
+    pil_format = VARIANT_FORMATS[fmt][0]
+    try:
+        opened = Image.open(src)
+    except UnidentifiedImageError as exc:
+        raise ValueError("source is not a decodable image") from exc
+    with opened as im:
+        if width is not None and width < im.width:
+            height = max(1, round(im.height * width / im.width))
+            # JPEG: direkt in reduzierter Auflösung dekodieren statt volles Bild
+            im.draft("RGB", (width, height))
+        im = ImageOps.exif_transpose(im)
+        if width is not None and width < im.width:
+            im.thumbnail((width, im.height * width // im.width + 1), Image.Resampling.LANCZOS)
+        if pil_format == "JPEG" and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.part")
+        try:
+            im.save(tmp, pil_format, quality=VARIANT_QUALITY, optimize=True)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+
+class VariantCache:
+    """
+    Größenbegrenzter LRU-Cache für Bildvarianten auf Platte.
+    Jede Variante wird genau einmal erzeugt (Single-Flight pro Key), danach
+    nur noch ausgeliefert. Den Bestand auf Platte liest scan() ein (App-Start, nicht beim
+    Import); bis dahin werden vorhandene Dateien beim ersten Zugriff übernommen.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[Path, asyncio.Future] = {}
+
+    def scan(self) -> None:
+        """Blockierend (rglob über das ganze Verzeichnis) – im Threadpool aufrufen."""
+        if not self.root.exists():
+            return
+        files = [p for p in self.root.rglob("*") if p.is_file() and not p.name.endswith(".part")]
+        scanned: OrderedDict[Path, int] = OrderedDict(
+            (path, path.stat().st_size) for path in sorted(files, key=lambda p: p.stat().st_mtime)
+        )
+        with self._lock:
+            # seit dem Start benutzte Einträge sind neuer als alles auf Platte -> bleiben hinten
+            for path in self._entries:
+                scanned.pop(path, None)
+            self._total += sum(scanned.values())
+            scanned.update(self._entries)
+            self._entries = scanned
+        self._evict()
+
+    def _key_path(self, src: Path, width: int | None, fmt: str) -> Path:
+        stat = src.stat()
+        # mtime/size im Key: wird eine (nicht inhaltsadressierte) Quelle ersetzt, entsteht eine neue Variante
+        raw = f"{src}|{stat.st_mtime_ns}|{stat.st_size}|{width}|{fmt}"
+        key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return self.root / key[:2] / f"{key}{VARIANT_FORMATS[fmt][1]}"
+
+    def _touch(self, path: Path) -> bool:
+        with self._lock:
+            if path not in self._entries:
+                if not path.is_file():
+                    return False
+                # von einem früheren Lauf, scan() war noch nicht dran
+                size = path.stat().st_size
+                self._entries[path] = size
+                self._total += size
+                return True
+            if path.exists():
+                self._entries.move_to_end(path)
+                return True
+            # von außen gelöscht -> neu erzeugen
+            self._total -= self._entries.pop(path)
+            return False
+
+    def _add(self, path: Path) -> None:
+        size = path.stat().st_size
+        with self._lock:
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            victims = []
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                path, size = self._entries.popitem(last=False)
+                self._total -= size
+                victims.append(path)
+        for path in victims:
+            path.unlink(missing_ok=True)
+
+    async def get(self, src: Path, width: int | None = None, fmt: str | None = None) -> tuple[Path, str]:
+        """Liefert (Pfad der Variante, Media-Type); erzeugt sie bei Bedarf."""
+        fmt = (fmt or _SUFFIX_TO_FMT.get(src.suffix.lower(), "jpeg")).lower()
+        if fmt not in VARIANT_FORMATS:
+            raise ValueError(f"fmt must be one of {sorted(VARIANT_FORMATS)}")
+        width = snap_width(width)
+        media_type = VARIANT_FORMATS[fmt][2]
+
+        dest = self._key_path(src, width, fmt)
+        if self._touch(dest):
+            return dest, media_type
+
+        pending = self._inflight.get(dest)
+        if pending is not None:
+            await asyncio.shield(pending)
+            return dest, media_type
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[dest] = future
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            await run_in_threadpool(render_variant, src, dest, width, fmt)
+            self._add(dest)
+            future.set_result(None)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(dest) is future:
+                del self._inflight[dest]
+        return dest, media_type
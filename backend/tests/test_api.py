@@ -1,9 +1,15 @@
+import asyncio
+import csv
+import io
+import json
 from io import BytesIO
 
 import pytest
 from PIL import Image
+from sqlalchemy import text
 from sqlmodel import Session, delete
 
+from simple_social_backend.cache import POST_CACHE
 from simple_social_backend.models import Post, TextGenJob
 import simple_social_backend.db as db
 
@@ -16,7 +22,12 @@ def _clear_db():
     with Session(db.get_engine()) as session:
         session.exec(delete(Post))
         session.exec(delete(TextGenJob))
+        session.execute(text("DELETE FROM event_outbox"))
+        # alle Tests laden dasselbe PNG hoch -> Refcounts dürfen nicht in den nächsten Test lecken
+        session.execute(text("DELETE FROM image_ref"))
         session.commit()
+    # direkt in der DB gelöscht -> Read-Through-Cache bekommt das nicht mit
+    asyncio.run(POST_CACHE.clear())
 
 
 def _post(client, user: str, text: str, filename: str = "img.png"):
@@ -70,3 +81,323 @@ def test_list_posts_filter_by_user_query_param(client):
     data = r.json()
     assert len(data) == 2
     assert {p["user"] for p in data} == {"alice"}
+
+
+def test_list_posts_keyset_pagination(client):
+    _clear_db()
+    for i in range(5):
+        _post(client, user="alice", text=f"p{i}", filename=f"{i}.png")
+
+    r1 = client.get("/posts", params={"limit": 2})
+    assert r1.status_code == 200
+    page1 = r1.json()
+    assert [p["text"] for p in page1] == ["p4", "p3"]
+    cursor = r1.headers["X-Next-Cursor"]
+
+    r2 = client.get("/posts", params={"limit": 2, "cursor": cursor})
+    assert [p["text"] for p in r2.json()] == ["p2", "p1"]
+
+    r3 = client.get("/posts", params={"limit": 2, "cursor": r2.headers["X-Next-Cursor"]})
+    assert [p["text"] for p in r3.json()] == ["p0"]
+    assert "X-Next-Cursor" not in r3.headers
+
+
+def test_list_posts_invalid_cursor_returns_400(client):
+    _clear_db()
+    r = client.get("/posts", params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+
+def test_search_is_ranked_and_stemmed(client):
+    _clear_db()
+    _post(client, user="alice", text="Katze auf dem Sofa", filename="1.png")
+    _post(client, user="bob", text="Spaziergang am See", filename="2.png")
+    _post(client, user="carol", text="Katzen, Katzen, überall Katzen", filename="3.png")
+
+    r = client.get("/posts/search", params={"query": "  KATZE "})
+    assert r.status_code == 200
+    texts = [p["text"] for p in r.json()]
+    assert texts == ["Katzen, Katzen, überall Katzen", "Katze auf dem Sofa"]
+
+
+def test_search_pagination_keeps_tied_ranks(client):
+    _clear_db()
+    # gleicher Text -> gleicher Rang (0.1, als float4 nicht exakt darstellbar) über Seitengrenzen hinweg
+    for i in range(5):
+        _post(client, user=f"u{i}", text="Katze auf dem Sofa", filename=f"{i}.png")
+    _post(client, user="carol", text="Katzen, Katzen, überall Katzen", filename="x.png")
+
+    seen, cursor = [], None
+    for _ in range(10):
+        params = {"query": "katze", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/posts/search", params=params)
+        assert r.status_code == 200
+        seen.extend(p["user"] for p in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen[0] == "carol"
+    assert sorted(seen[1:]) == [f"u{i}" for i in range(5)]
+    assert len(seen) == 6
+
+
+def test_thumbnail_update_invalidates_cached_post(client):
+    _clear_db()
+    post = _post(client, user="anna", text="hi", filename="a.png").json()
+
+    # füllt den Cache
+    assert client.get(f"/posts/{post['id']}").json()["image_small"] is None
+    assert client.get("/posts/latest").json()["image_small"] is None
+
+    r = client.put(f"/posts/{post['id']}/thumbnail", json={"image_small": "/images/thumbs/a.png"})
+    assert r.status_code == 200
+
+    assert client.get(f"/posts/{post['id']}").json()["image_small"] == "/images/thumbs/a.png"
+    assert client.get("/posts/latest").json()["image_small"] == "/images/thumbs/a.png"
+
+
+def test_post_etag_returns_304_until_changed(client):
+    _clear_db()
+    post = _post(client, user="anna", text="hi", filename="a.png").json()
+
+    r1 = client.get(f"/posts/{post['id']}")
+    etag = r1.headers["ETag"]
+    r2 = client.get(f"/posts/{post['id']}", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+
+    client.put(f"/posts/{post['id']}/thumbnail", json={"image_small": "/images/thumbs/a.png"})
+    r3 = client.get(f"/posts/{post['id']}", headers={"If-None-Match": etag})
+    assert r3.status_code == 200
+    assert r3.headers["ETag"] != etag
+
+
+def test_list_etag_changes_on_new_post(client):
+    _clear_db()
+    _post(client, user="alice", text="one", filename="1.png")
+
+    etag = client.get("/posts").headers["ETag"]
+    assert client.get("/posts", headers={"If-None-Match": etag}).status_code == 304
+
+    _post(client, user="bob", text="two", filename="2.png")
+    r = client.get("/posts", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.json()) == 2
+
+
+def test_list_etag_changes_on_update_and_delete(client):
+    _clear_db()
+    post = _post(client, user="alice", text="one", filename="1.png").json()
+    _post(client, user="bob", text="two", filename="2.png")
+
+    etag1 = client.get("/posts").headers["ETag"]
+    client.put(f"/posts/{post['id']}/thumbnail", json={"image_small": "/images/thumbs/1.png"})
+    r = client.get("/posts", headers={"If-None-Match": etag1})
+    assert r.status_code == 200
+    etag2 = r.headers["ETag"]
+    assert etag2 != etag1
+
+    assert client.delete(f"/posts/{post['id']}").status_code == 204
+    r = client.get("/posts", headers={"If-None-Match": etag2})
+    assert r.status_code == 200
+    assert [p["user"] for p in r.json()] == ["bob"]
+    assert r.headers["ETag"] not in (etag1, etag2)
+
+
+def test_export_streams_ndjson_and_csv(client):
+    _clear_db()
+    _post(client, user="alice", text="one", filename="1.png")
+    _post(client, user="bob", text="two", filename="2.png")
+    _post(client, user="alice", text="drei, mit Komma", filename="3.png")
+
+    r = client.get("/posts/export", params={"format": "ndjson", "user": "alice"})
+    assert r.status_code == 200
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["text"] for row in rows] == ["one", "drei, mit Komma"]
+
+    r = client.get("/posts/export", params={"format": "csv"})
+    assert r.status_code == 200
+    records = list(csv.DictReader(io.StringIO(r.text)))
+    assert [rec["text"] for rec in records] == ["one", "two", "drei, mit Komma"]
+
+
+def test_create_post_rejects_non_image_upload(client):
+    _clear_db()
+    files = {"image": ("evil.png", BytesIO(b"#!/bin/sh\necho hi\n"), "image/png")}
+    r = client.post("/posts", data={"user": "mallory", "text": "hi"}, files=files)
+    assert r.status_code == 415
+
+
+def test_create_post_rejects_too_large_upload(client, monkeypatch):
+    _clear_db()
+    import simple_social_backend.uploads as uploads
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1024)
+
+    big = BytesIO(b"\x89PNG\r\n\x1a\n" + b"\0" * 4096)
+    r = client.post("/posts", data={"user": "anna", "text": "hi"}, files={"image": ("big.png", big, "image/png")})
+    assert r.status_code == 413
+
+
+def test_identical_uploads_are_deduplicated_and_refcounted(client):
+    _clear_db()
+    import simple_social_backend.main as main
+
+    p1 = _post(client, user="alice", text="one", filename="a.png").json()
+    p2 = _post(client, user="bob", text="two", filename="b.png").json()
+    assert p1["image"] == p2["image"]
+    assert p1["image"].startswith("/images/original/")
+
+    path = main.IMAGE_STORE.url_to_path(p1["image"])
+    r = client.get(p1["image"])
+    assert r.status_code == 200
+    assert "immutable" in r.headers["Cache-Control"]
+
+    assert client.delete(f"/posts/{p1['id']}").status_code == 204
+    assert path.exists()  # noch von p2 referenziert
+    assert client.delete(f"/posts/{p2['id']}").status_code == 204
+    assert not path.exists()
+
+
+def test_orphaned_image_is_kept_when_reuploaded_before_reclaim(client):
+    """Löschen und Upload desselben Bildes überlappen: die Datei darf nicht verschwinden."""
+    _clear_db()
+    import simple_social_backend.main as main
+
+    p1 = _post(client, user="alice", text="one").json()
+    path = main.IMAGE_STORE.url_to_path(p1["image"])
+
+    orphaned = db.delete_post(p1["id"])  # Zähler 0, Dateien noch nicht gelöscht
+    assert orphaned and orphaned[0] == p1["image"]
+    p2 = _post(client, user="bob", text="two").json()  # dedupliziert gegen die noch vorhandene Datei
+    assert p2["image"] == p1["image"]
+
+    assert db.reclaim_orphaned_images(orphaned, main.IMAGE_STORE.remove) is False
+    assert path.exists()
+    assert client.get(p2["image"]).status_code == 200
+
+
+def _fail_resize_event(post):
+    raise RuntimeError("outbox insert failed")
+
+
+def test_failed_add_post_removes_stored_image(client, monkeypatch):
+    """Scheitert die Transaktion nach store(), darf keine unreferenzierte Datei liegen bleiben."""
+    _clear_db()
+    import simple_social_backend.main as main
+
+    url = "/images/original/ab/cd/" + "ab" * 32 + ".png"
+    path = main.IMAGE_STORE.url_to_path(url)
+
+    def store():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"png")
+
+    monkeypatch.setattr(db, "_disabled", lambda: False)  # sonst kein Outbox-Insert
+    monkeypatch.setattr(db, "_image_resize_event", _fail_resize_event)
+    with pytest.raises(RuntimeError):
+        db.add_post(image=url, text="hi", user="anna", store=store, remove=main.IMAGE_STORE.remove)
+
+    assert not path.exists()
+    with Session(db.get_engine()) as session:
+        assert session.execute(text("SELECT count(*) FROM image_ref")).scalar_one() == 0
+        assert session.execute(text("SELECT count(*) FROM post")).scalar_one() == 0
+
+
+def test_failed_add_post_keeps_image_referenced_by_other_posts(client, monkeypatch):
+    _clear_db()
+    import simple_social_backend.main as main
+
+    p1 = _post(client, user="alice", text="one").json()
+    path = main.IMAGE_STORE.url_to_path(p1["image"])
+
+    monkeypatch.setattr(db, "_disabled", lambda: False)  # sonst kein Outbox-Insert
+    monkeypatch.setattr(db, "_image_resize_event", _fail_resize_event)
+    with pytest.raises(RuntimeError):
+        db.add_post(image=p1["image"], text="two", user="bob", store=lambda: None, remove=main.IMAGE_STORE.remove)
+
+    assert path.exists()
+    assert client.get(p1["image"]).status_code == 200
+
+
+def test_image_variant_is_resized_and_reencoded(client):
+    _clear_db()
+    post = _post(client, user="alice", text="variant").json()
+    variant_url = "/variants" + post["image"][len("/images"):]
+
+    r = client.get(variant_url, params={"w": 16, "fmt": "webp"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/webp"
+    assert "immutable" in r.headers["Cache-Control"]
+    # 16 wird auf die kleinste erlaubte Breite gerundet, hochskaliert wird nie
+    assert Image.open(BytesIO(r.content)).width <= 32
+
+    assert client.get(variant_url, params={"fmt": "tiff"}).status_code == 400
+    assert client.get("/variants/original/missing.png").status_code == 404
+
+
+def test_variant_cache_control_depends_on_content_addressing(client):
+    _clear_db()
+    import simple_social_backend.main as main
+    from simple_social_backend.image_store import IMMUTABLE_CACHE_CONTROL
+
+    post = _post(client, user="alice", text="variant").json()
+    r = client.get("/variants" + post["image"][len("/images"):], params={"w": 160})
+    assert r.status_code == 200
+    assert r.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+    # Altbestand unter festem Namen kann ersetzt werden -> nicht immutable
+    legacy = main.IMAGE_STORE.url_to_path("/images/original/legacy-variant.png")
+    legacy.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (32, 32)).save(legacy, "PNG")
+    try:
+        r = client.get("/variants/original/legacy-variant.png", params={"w": 160})
+        assert r.status_code == 200
+        assert "immutable" not in r.headers["Cache-Control"]
+    finally:
+        legacy.unlink(missing_ok=True)
+
+
+def test_sentiment_verdicts_are_cached_by_normalized_text(monkeypatch):
+    import simple_social_backend.events_async as events_async
+
+    calls = []
+
+    async def rpc_verdict(text):
+        calls.append(text)
+        await asyncio.sleep(0)
+        if text == "slow":
+            raise TimeoutError("offline")
+        return "Positive" if text.strip() == "Nice!" else None
+
+    monkeypatch.setattr(events_async, "_disabled", lambda: False)
+    monkeypatch.setattr(events_async, "_rpc_verdict", rpc_verdict)
+    cache = events_async.SENTIMENT_VERDICTS
+
+    async def scenario():
+        await cache.clear()
+        cache.hits = cache.misses = 0
+        # gleichzeitige Checks für denselben (normalisierten) Text teilen sich einen RPC
+        first = await asyncio.gather(
+            events_async.check_sentiment_rpc("Nice!"),
+            events_async.check_sentiment_rpc("  Nice!\n"),
+        )
+        again = await events_async.check_sentiment_rpc("Nice!  ")
+        unclear = [await events_async.check_sentiment_rpc("hmm") for _ in range(2)]
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await events_async.check_sentiment_rpc("slow")
+        await cache.clear()
+        return first, again, unclear
+
+    first, again, unclear = asyncio.run(scenario())
+
+    assert first == ["Positive", "Positive"]
+    assert again == "Positive"
+    assert [c for c in calls if c.strip() == "Nice!"] == ["Nice!"]
+    assert cache.hits == 1
+    # keine eindeutige Antwort -> Neutral, aber nicht gecacht; Timeouts werden nie gecacht
+    assert unclear == ["Neutral", "Neutral"]
+    assert calls.count("hmm") == 2
+    assert calls.count("slow") == 2
@@ -0,0 +1,125 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import simple_social_backend.migrations as migrations
+from simple_social_backend.migrations import Migration, migrate
+
+pytestmark = pytest.mark.api
+
+
+@pytest.fixture()
+def scratch_engine(docker_postgres):
+    """Eigene, leere Datenbank pro Test – die Migrationen sollen bei null anfangen."""
+    cfg = docker_postgres
+    base = f"postgresql+psycopg://{cfg['db_user']}:{cfg['db_password']}@{cfg['host']}:{cfg['port']}"
+    name = f"migrations_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(f"{base}/{cfg['db_name']}", isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    engine = create_engine(f"{base}/{name}")
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+
+def _recorded_versions(engine) -> list[int]:
+    with engine.connect() as conn:
+        return list(conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars())
+
+
+def test_migrate_applies_every_migration_once(scratch_engine):
+    first = migrate(scratch_engine)
+
+    assert [m.version for m in first] == sorted(m.version for m in migrations.MIGRATIONS)
+    assert migrate(scratch_engine) == []
+    assert _recorded_versions(scratch_engine) == [m.version for m in first]
+
+
+def test_migrate_skips_recorded_versions(scratch_engine, monkeypatch):
+    monkeypatch.setattr(
+        migrations,
+        "MIGRATIONS",
+        [
+            Migration(1, "one", statements=("CREATE TABLE one (x int)",)),
+            Migration(2, "two", statements=("CREATE TABLE two (x int)",)),
+            Migration(3, "three", statements=("CREATE TABLE three (x int)",)),
+        ],
+    )
+    migrations.applied_versions(scratch_engine)  # legt schema_migrations an
+    with scratch_engine.begin() as conn:
+        conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (2, 'two')"))
+
+    applied = migrate(scratch_engine)
+
+    assert [m.version for m in applied] == [1, 3]
+    with scratch_engine.connect() as conn:
+        tables = set(conn.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")).scalars())
+    assert {"one", "three"} <= tables
+    assert "two" not in tables
+
+
+def test_migrate_rebuilds_invalid_concurrent_index(scratch_engine):
+    migrate(scratch_engine)
+    # Zustand nach einem abgebrochenen CREATE INDEX CONCURRENTLY nachstellen
+    with scratch_engine.begin() as conn:
+        conn.execute(text("UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'ix_post_created_at_id'::regclass"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 2"))
+
+    assert [m.version for m in migrate(scratch_engine)] == [2]
+
+    with scratch_engine.connect() as conn:
+        valid = conn.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_post_created_at_id'::regclass")
+        ).scalar_one()
+    assert valid is True
+
+
+class _Rows:
+    def __init__(self, rows: list[str]):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class _RecordingConnection:
+    """Statt Postgres: meldet `invalid` als INVALID-Indizes und merkt sich alle Statements."""
+
+    def __init__(self, invalid: list[str]):
+        self.invalid = invalid
+        self.statements: list[str] = []
+
+    def execute(self, stmt, params=None):
+        self.statements.append(str(stmt))
+        return _Rows(self.invalid if "indisvalid" in str(stmt) else [])
+
+
+def test_drop_invalid_indexes_only_drops_reported_concurrent_indexes():
+    conn = _RecordingConnection(invalid=["ix_post_text_fts"])
+    statements = (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_post_created_at_id ON post (created_at DESC, id DESC)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_post_text_fts ON post USING GIN (to_tsvector('german', text))",
+        "ALTER TABLE post ADD COLUMN IF NOT EXISTS x int",
+    )
+
+    migrations._drop_invalid_indexes(conn, statements)
+
+    assert conn.statements[-1] == 'DROP INDEX CONCURRENTLY IF EXISTS "ix_post_text_fts"'
+    assert len(conn.statements) == 2
+
+
+def test_drop_invalid_indexes_skips_migrations_without_concurrent_indexes():
+    conn = _RecordingConnection(invalid=["anything"])
+
+    migrations._drop_invalid_indexes(conn, ("CREATE TABLE t (x int)",))
+
+    assert conn.statements == []
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+
+import simple_social_backend.db as db
+import simple_social_backend.outbox as outbox
+from simple_social_backend.db_async import dispose_async_engine
+
+pytestmark = pytest.mark.api
+
+
+def _reset_outbox() -> None:
+    db.init_db()
+    with Session(db.get_engine()) as session:
+        session.execute(text("DELETE FROM event_outbox"))
+        session.commit()
+
+
+def _outbox_rows() -> list:
+    with Session(db.get_engine()) as session:
+        return session.execute(text("SELECT queue, attempts, failed_at FROM event_outbox ORDER BY id")).all()
+
+
+def _relay(times: int) -> list[int]:
+    async def run():
+        try:
+            return [await outbox.relay_batch() for _ in range(times)]
+        finally:
+            await dispose_async_engine()
+
+    return asyncio.run(run())
+
+
+def test_disabled_queues_write_no_outbox_rows(client):
+    _reset_outbox()
+
+    db.add_post(image="/images/original/x.png", text="hi", user="anna")
+    db.create_textgen_job("Es war einmal", 20)
+
+    assert _outbox_rows() == []
+
+
+def test_relay_publishes_with_a_single_timeout_and_deletes(client, monkeypatch):
+    _reset_outbox()
+    monkeypatch.setattr(db, "_disabled", lambda: False)
+    db.create_textgen_job("Es war einmal", 20)
+
+    published = []
+
+    async def publish_confirmed(queue, body, timeout_seconds):
+        published.append((queue, timeout_seconds))
+
+    monkeypatch.setattr(outbox, "publish_confirmed", publish_confirmed)
+
+    assert _relay(1) == [1]
+    assert published == [(db.TEXTGEN_QUEUE, outbox.OUTBOX_PUBLISH_TIMEOUT_SECONDS)]
+    assert _outbox_rows() == []
+
+
+def test_relay_gives_up_after_max_attempts(client, monkeypatch):
+    _reset_outbox()
+    monkeypatch.setattr(db, "_disabled", lambda: False)
+    db.create_textgen_job("Es war einmal", 20)
+
+    calls = []
+
+    async def publish_confirmed(queue, body, timeout_seconds):
+        calls.append(queue)
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(outbox, "publish_confirmed", publish_confirmed)
+    monkeypatch.setattr(outbox, "OUTBOX_RETRY_SECONDS", 0)  # sofort wieder fällig
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+
+    assert _relay(3) == [0, 0, 0]
+
+    assert len(calls) == 2  # der dritte Lauf claimt die aufgegebene Zeile nicht mehr
+    [(queue, attempts, failed_at)] = _outbox_rows()
+    assert (queue, attempts) == (db.TEXTGEN_QUEUE, 2)
+    assert failed_at is not None
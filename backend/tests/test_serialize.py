@@ -0,0 +1,42 @@
+import importlib
+import sys
+from datetime import datetime
+
+import pytest
+from pydantic import TypeAdapter
+
+import simple_social_backend.serialize as serialize
+from simple_social_backend.db import _POST_OUT_COLUMNS
+from simple_social_backend.main import PostOut
+
+pytestmark = pytest.mark.api
+
+ROWS = [
+    (1, "/images/original/a.png", "/images/thumbs/a.png", "Grüße aus Wien 😊", "anna", datetime(2024, 1, 2, 3, 4, 5, 123456)),
+    (2, "/images/original/b.png", None, 'Zitat: "hi"\nneue Zeile', "bob", datetime(2024, 1, 2, 3, 4, 5)),
+]
+
+
+def _via_post_out(rows) -> bytes:
+    posts = [PostOut(**dict(zip(serialize.POST_OUT_FIELDS, row))) for row in rows]
+    return TypeAdapter(list[PostOut]).dump_json(posts)
+
+
+def test_fast_path_fields_match_post_out_and_select_columns():
+    assert serialize.POST_OUT_FIELDS == tuple(PostOut.model_fields)
+    assert serialize.POST_OUT_FIELDS == tuple(col.key for col in _POST_OUT_COLUMNS)
+
+
+def test_rows_to_json_matches_post_out_serialization():
+    assert serialize.rows_to_json(ROWS) == _via_post_out(ROWS)
+
+
+def test_rows_to_json_without_orjson_matches_post_out_serialization(monkeypatch):
+    monkeypatch.setitem(sys.modules, "orjson", None)  # ImportError beim Import
+    try:
+        fallback = importlib.reload(serialize)
+        assert fallback.orjson is None
+        assert fallback.rows_to_json(ROWS) == _via_post_out(ROWS)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(serialize)
@@ -0,0 +1,63 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session, delete
+
+import simple_social_backend.db as db
+from simple_social_backend.cli import seed
+from simple_social_backend.models import Post
+from simple_social_backend.synthetic import copy_posts, generate_posts, insert_posts
+
+pytestmark = pytest.mark.api
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+def test_generate_posts_is_deterministic_with_seed():
+    first = list(generate_posts(200, 10, seed=42, now=NOW))
+
+    assert first == list(generate_posts(200, 10, seed=42, now=NOW))
+    assert first != list(generate_posts(200, 10, seed=43, now=NOW))
+
+
+def test_generate_posts_stays_within_users_and_days():
+    rows = list(generate_posts(2_000, 50, days=7, seed=1, now=NOW))
+
+    assert len(rows) == 2_000
+    users = Counter(row[3] for row in rows)
+    assert set(users) <= {f"user{i:06d}" for i in range(50)}
+    # Zipf-ähnlich: der erste Benutzer postet deutlich mehr als der letzte
+    assert users["user000000"] > 5 * users.get("user000049", 0)
+    assert all(NOW - timedelta(days=7) <= row[4] <= NOW for row in rows)
+    assert len({row[0] for row in rows}) == 2_000  # Bildnamen eindeutig
+
+
+def test_generate_posts_rejects_zero_users():
+    with pytest.raises(ValueError):
+        next(generate_posts(1, 0))
+
+
+@pytest.mark.parametrize("argv", [["--users", "0"], ["--posts", "-1"], ["--days", "0"], ["--batch-size", "0"]])
+def test_seed_rejects_invalid_arguments(argv):
+    with pytest.raises(SystemExit) as exc:
+        seed(argv)
+    assert exc.value.code == 2
+
+
+@pytest.mark.parametrize("load", [copy_posts, insert_posts])
+def test_bulk_load_writes_every_generated_row(client, load):
+    db.init_db()
+    with Session(db.get_engine()) as session:
+        session.exec(delete(Post))
+        session.commit()
+
+    # batch_size kleiner als die Zeilenzahl -> mehrere COPY-Batches/Commits
+    total = load(db.get_engine(), generate_posts(250, 5, seed=7, now=NOW), batch_size=100)
+
+    assert total == 250
+    with Session(db.get_engine()) as session:
+        count, users = session.execute(text('SELECT count(*), count(DISTINCT "user") FROM post')).one()
+    assert count == 250
+    assert 1 <= users <= 5
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+import pytest
+from PIL import Image
+
+from simple_social_backend.variants import VariantCache
+
+pytestmark = pytest.mark.api
+
+
+def _image(path, width=64):
+    Image.new("RGB", (width, width), "red").save(path, "PNG")
+    return path
+
+
+def test_variant_cache_does_not_scan_on_construction(tmp_path):
+    root = tmp_path / "variants"
+    (root / "ab").mkdir(parents=True)
+    (root / "ab" / "old.webp").write_bytes(b"x" * 10)
+
+    cache = VariantCache(root, max_bytes=1024)
+
+    assert cache._total == 0
+    cache.scan()
+    assert cache._total == 10
+
+
+def test_variant_cache_reuses_files_from_before_the_scan(tmp_path):
+    src = _image(tmp_path / "src.png")
+    root = tmp_path / "variants"
+    path, _ = asyncio.run(VariantCache(root, max_bytes=10**6).get(src, width=160, fmt="webp"))
+    os.utime(path, (1, 1))  # so sähe ein Bestand aus einem früheren Lauf aus
+    mtime_before = path.stat().st_mtime_ns
+
+    # neuer Prozess, scan() noch nicht gelaufen: die Datei wird übernommen, nicht neu gerendert
+    cache = VariantCache(root, max_bytes=10**6)
+    again, media_type = asyncio.run(cache.get(src, width=160, fmt="webp"))
+
+    assert (again, media_type) == (path, "image/webp")
+    assert path.stat().st_mtime_ns == mtime_before
+    size = path.stat().st_size
+    cache.scan()  # spätere Inventur zählt die Datei nicht doppelt
+    assert cache._total == size
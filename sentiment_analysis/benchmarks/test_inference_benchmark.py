@@ -0,0 +1,57 @@
+# sentiment_analysis/benchmarks/test_inference_benchmark.py
+"""
+pytest-benchmark-Suite für predict_batch() (nicht in den testpaths, siehe README):
+
+    pytest sentiment_analysis/benchmarks -m benchmark --benchmark-json=bench.json
+    pytest sentiment_analysis/benchmarks -m benchmark --benchmark-autosave
+    pytest sentiment_analysis/benchmarks -m benchmark --benchmark-compare   # gegen letzten gespeicherten Lauf
+
+Kleines BERT mit Zufallsgewichten, läuft offline.
+"""
+import tempfile
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+torch = pytest.importorskip("torch")
+
+from simple_social_sentiment.benchmark import available_backends, make_texts, random_runtime
+from simple_social_sentiment.model import predict_batch
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope="module")
+def runtimes():
+    cache = {}
+
+    def get(backend: str, threads: int):
+        # ORT legt seine Threads beim Laden fest -> eigene Session pro Thread-Zahl
+        key = (backend, threads if backend == "onnx" else None)
+        if key not in cache:
+            cache[key] = random_runtime(backend, tempfile.mkdtemp(dir=workdir))
+        return cache[key]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        yield get
+
+
+@pytest.fixture(params=[1, 4], ids=lambda n: f"t{n}")
+def threads(request):
+    previous = torch.get_num_threads()
+    torch.set_num_threads(request.param)
+    yield request.param
+    torch.set_num_threads(previous)
+
+
+@pytest.mark.parametrize("seq_len", [16, 64, 128], ids=lambda n: f"s{n}")
+@pytest.mark.parametrize("batch_size", [1, 8, 32], ids=lambda n: f"b{n}")
+@pytest.mark.parametrize("backend", available_backends())
+def test_predict_batch(benchmark, runtimes, threads, backend, batch_size, seq_len):
+    runtime = runtimes(backend, threads)
+    texts = make_texts(batch_size, seq_len)
+    benchmark.extra_info.update(backend=backend, threads=threads, batch_size=batch_size, seq_len=seq_len)
+
+    labels = benchmark(predict_batch, runtime, texts)
+
+    assert len(labels) == batch_size
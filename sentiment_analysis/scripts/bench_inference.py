@@ -0,0 +1,61 @@
+# sentiment_analysis/scripts/bench_inference.py
+"""
+Latenz (p50/p90/p99) und Durchsatz von predict_batch() über Batchgrößen,
+Sequenzlängen, Thread-Zahlen und Inferenz-Backends.
+
+Läuft offline: kleines BERT mit Zufallsgewichten (benchmark.SMALL_BERT), kein Checkpoint.
+
+    python scripts/bench_inference.py --out bench.json
+    python scripts/bench_inference.py --backends eager,int8 --threads 1,4 --batch-sizes 1,16 --seq-lens 32,128
+    python scripts/bench_inference.py --out new.json --compare bench.json   # Vergleich mit älterem Commit
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from simple_social_sentiment.benchmark import SMALL_BERT, available_backends, report, run_matrix
+
+
+def _ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nvs. {baseline['meta'].get('commit') or 'baseline'} (texts/s, + = schneller)")
+    for key, result in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        delta = result["texts_per_second"] / old["texts_per_second"] - 1
+        print(f"{key:<24} {old['texts_per_second']:9.1f} -> {result['texts_per_second']:9.1f}  {delta:+7.1%}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(available_backends()))
+    parser.add_argument("--threads", type=_ints, default=[1, 4])
+    parser.add_argument("--batch-sizes", type=_ints, default=[1, 8, 32])
+    parser.add_argument("--seq-lens", type=_ints, default=[16, 64, 128])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--out", help="JSON-Ergebnis schreiben")
+    parser.add_argument("--compare", help="älteres JSON-Ergebnis zum Vergleich")
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    results = run_matrix(backends, args.threads, args.batch_sizes, args.seq_lens, repeat=args.repeat)
+    data = report(results, SMALL_BERT)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"💾 saved {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(data, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# sentiment_analysis/scripts/cascade.py
+"""
+Vorstufe (gehashte n-Gramme) für die Sentiment-Kaskade trainieren und bewerten.
+Trainiert wird auf den Labels des vollen Modells (Distillation), bewertet wird
+die Übereinstimmung mit dem vollen Modell und der Anteil, den BERT nicht mehr sieht.
+
+    python scripts/cascade.py label --texts posts.txt --out models/posts.tsv      # BERT-Labels (einmalig)
+    python scripts/cascade.py train --data models/posts.tsv --out models/cascade.npz
+    python scripts/cascade.py eval  --data models/heldout.tsv --model models/cascade.npz \\
+        --thresholds 0.8,0.9,0.95
+
+Im Container: SENTIMENT_CASCADE_PATH=/app/cascade.npz SENTIMENT_CASCADE_THRESHOLD=0.9
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+
+from simple_social_sentiment.cascade import HashedNgramClassifier, SentimentCascade
+from simple_social_sentiment.model import LABELS
+
+LABEL_IDS = {name: i for i, name in LABELS.items()}
+
+
+def read_tsv(path: str) -> tuple[list[str], list[str]]:
+    """Zeilen `label<TAB>text` (Tabs/Zeilenumbrüche im Text sind beim Schreiben ersetzt)."""
+    labels, texts = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            label, _, text = line.rstrip("\n").partition("\t")
+            if label in LABEL_IDS and text:
+                labels.append(label)
+                texts.append(text)
+    return texts, labels
+
+
+def label(texts_path: str, out: str, batch_size: int) -> None:
+    from simple_social_sentiment.model import load_runtime, predict_batch
+
+    with open(texts_path, encoding="utf-8") as f:
+        texts = [" ".join(line.split()) for line in f if line.strip()]
+    runtime = load_runtime()
+    with open(out, "w", encoding="utf-8") as f:
+        for start in range(0, len(texts), batch_size):
+            chunk = texts[start:start + batch_size]
+            for text, sentiment in zip(chunk, predict_batch(runtime, chunk)):
+                f.write(f"{sentiment}\t{text}\n")
+    print(f"💾 labeled {len(texts)} texts -> {out}")
+
+
+def train(data: str, out: str, dims: int, epochs: int) -> None:
+    texts, labels = read_tsv(data)
+    print(f"⏳ training on {len(texts)} texts ({dims} dims, {epochs} epochs)")
+    model = HashedNgramClassifier.empty(dims).fit(texts, [LABEL_IDS[l] for l in labels], epochs=epochs)
+    model.save(out)
+    print(f"💾 saved {out}")
+
+
+def evaluate(data: str, model_path: str, thresholds: list[float]) -> list[dict]:
+    """Pro Schwelle: Anteil ohne BERT, Übereinstimmung auf diesem Anteil und insgesamt."""
+    texts, reference = read_tsv(data)
+    fast = HashedNgramClassifier.load(model_path)
+    rows = []
+    for threshold in thresholds:
+        cascade = SentimentCascade(fast, threshold)
+        start = time.perf_counter()
+        labels, uncertain = cascade.route(texts)
+        elapsed = time.perf_counter() - start
+        offloaded = [i for i, l in enumerate(labels) if l is not None]
+        agree = sum(labels[i] == reference[i] for i in offloaded)
+        n = len(texts)
+        rows.append(
+            {
+                "threshold": threshold,
+                "texts": n,
+                "offload_rate": len(offloaded) / n if n else 0.0,
+                # Agreement der vorab entschiedenen Texte; der Rest kommt von BERT und stimmt per Definition
+                "offloaded_agreement": agree / len(offloaded) if offloaded else 1.0,
+                "overall_agreement": (agree + len(uncertain)) / n if n else 1.0,
+                "us_per_text": 1e6 * elapsed / n if n else 0.0,
+            }
+        )
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_label = sub.add_parser("label", help="Texte mit dem vollen Modell labeln -> TSV")
+    p_label.add_argument("--texts", required=True, help="Textdatei, eine Zeile pro Post")
+    p_label.add_argument("--out", required=True)
+    p_label.add_argument("--batch-size", type=int, default=64)
+
+    p_train = sub.add_parser("train")
+    p_train.add_argument("--data", required=True, help="TSV aus `label`")
+    p_train.add_argument("--out", default="models/cascade.npz")
+    p_train.add_argument("--dims", type=int, default=2**18)
+    p_train.add_argument("--epochs", type=int, default=5)
+
+    p_eval = sub.add_parser("eval")
+    p_eval.add_argument("--data", required=True, help="TSV aus `label` (nicht die Trainingsdaten)")
+    p_eval.add_argument("--model", default="models/cascade.npz")
+    p_eval.add_argument("--thresholds", default="0.7,0.8,0.9,0.95,0.99")
+    p_eval.add_argument("--json", help="Ergebnis zusätzlich als JSON schreiben")
+
+    args = parser.parse_args(argv)
+    if args.command == "label":
+        label(args.texts, args.out, args.batch_size)
+    elif args.command == "train":
+        train(args.data, args.out, args.dims, args.epochs)
+    else:
+        rows = evaluate(args.data, args.model, [float(t) for t in args.thresholds.split(",") if t])
+        print(f"{'threshold':>9}  {'offload':>8}  {'agree(off)':>10}  {'agree(all)':>10}  {'µs/text':>8}")
+        for r in rows:
+            print(
+                f"{r['threshold']:9.2f}  {r['offload_rate']:8.1%}  {r['offloaded_agreement']:10.1%}  "
+                f"{r['overall_agreement']:10.1%}  {r['us_per_text']:8.1f}"
+            )
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
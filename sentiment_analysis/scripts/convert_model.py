@@ -1,38 +1,199 @@
-# sentiment_analysis/convert_model.py
+# sentiment_analysis/scripts/convert_model.py
+"""
+Modell-Konvertierung für den Sentiment-Service.
+
+    python scripts/convert_model.py                     # = clean (wie bisher)
+    python scripts/convert_model.py clean               # models/bert.pth (Pickle) -> models/bert_clean.pth (state_dict)
+    python scripts/convert_model.py bundle              # models/bert_clean.pth -> models/bundle/ (Offline-Start)
+    python scripts/convert_model.py export --format onnx [--int8]
+    python scripts/convert_model.py export --format torchscript [--int8]
+    python scripts/convert_model.py check --backend int8 [--texts posts.txt] [--min-agreement 0.98]
+    python scripts/convert_model.py check --backend onnx --artifact models/model.onnx
+
+bundle schreibt config.json + model.safetensors + Tokenizer; mit SENTIMENT_BUNDLE_DIR
+startet der Service dann ohne Hub/Netz und lädt die Gewichte nur einmal (mmap).
+
+export schreibt nach models/model.onnx bzw. models/model.ts (bzw. *.int8.*) und macht
+danach automatisch den Paritätscheck gegen das fp32-Modell. Im Container dann z.B.:
+
+    SENTIMENT_BACKEND=onnx SENTIMENT_ONNX_PATH=/app/model.onnx
+"""
+import argparse
+import os
+import sys
+import tempfile
+
 import torch
 import __main__
 from transformers import BertModel
 import torch.nn as nn
 
-# 1. Define the class exactly as it is in the pickle
-class SentimentClassifier(nn.Module):
-    def __init__(self, n_classes=3):
-        super(SentimentClassifier, self).__init__()
-        self.bert = BertModel.from_pretrained("bert-base-german-cased")
-        self.drop = nn.Dropout(p=0.3)
-        self.out = nn.Linear(self.bert.config.hidden_size, n_classes)
-  
-    def forward(self, input_ids, attention_mask, token_type_ids=None):
-        _, pooled_output = self.bert(
-          input_ids=input_ids,
-          attention_mask=attention_mask,
-          return_dict=False
-        )
-        output = self.drop(pooled_output)
-        return self.out(output)
-
-# 2. Monkey-patch the environment so pickle finds the class
-setattr(__main__, "SentimentClassifier", SentimentClassifier)
-
-# 3. Load the problematic full model
-print("⏳ Loading full model (legacy mode)...")
-# We use a safe loading trick if strict loading fails
-model = torch.load("models/bert.pth", map_location="cpu", weights_only=False)
-
-# 4. Extract ONLY the weights
-print("💾 Extracting weights (state_dict)...")
-state_dict = model.state_dict()
-
-# 5. Save as a clean .pth file
-torch.save(state_dict, "models/bert_clean.pth")
-print("✅ Success! 'bert_clean.pth' saved. Use this one from now on!")
+
+# -----------------------------------------------------------------------------
+# clean: altes Pickle (ganzes Modell) -> reines state_dict
+# -----------------------------------------------------------------------------
+def clean(src: str = "models/bert.pth", dest: str = "models/bert_clean.pth") -> None:
+    # 1. Define the class exactly as it is in the pickle
+    class SentimentClassifier(nn.Module):
+        def __init__(self, n_classes=3):
+            super(SentimentClassifier, self).__init__()
+            self.bert = BertModel.from_pretrained("bert-base-german-cased")
+            self.drop = nn.Dropout(p=0.3)
+            self.out = nn.Linear(self.bert.config.hidden_size, n_classes)
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            _, pooled_output = self.bert(
+              input_ids=input_ids,
+              attention_mask=attention_mask,
+              return_dict=False
+            )
+            output = self.drop(pooled_output)
+            return self.out(output)
+
+    # 2. Monkey-patch the environment so pickle finds the class
+    setattr(__main__, "SentimentClassifier", SentimentClassifier)
+
+    # 3. Load the problematic full model
+    print("⏳ Loading full model (legacy mode)...")
+    # We use a safe loading trick if strict loading fails
+    model = torch.load(src, map_location="cpu", weights_only=False)
+
+    # 4. Extract ONLY the weights
+    print("💾 Extracting weights (state_dict)...")
+    state_dict = model.state_dict()
+
+    # 5. Save as a clean .pth file
+    torch.save(state_dict, dest)
+    print(f"✅ Success! '{dest}' saved. Use this one from now on!")
+
+
+# -----------------------------------------------------------------------------
+# bundle: state_dict -> config.json + model.safetensors + Tokenizer
+# -----------------------------------------------------------------------------
+def bundle(state: str, out: str) -> bool:
+    from simple_social_sentiment.model import load_bundled_model, save_bundle
+
+    print(f"⏳ Writing offline bundle -> {out}")
+    weights = torch.load(state, map_location="cpu", weights_only=True)
+    save_bundle(weights, out)
+
+    # Rundreise: alles, was im Bundle steht, muss bitgleich zurückkommen
+    loaded = load_bundled_model(out, torch.device("cpu")).state_dict()
+    ok = all(torch.equal(weights[k], v) for k, v in loaded.items() if k in weights)
+    size = os.path.getsize(os.path.join(out, "model.safetensors"))
+    print(f"💾 saved {out} ({size / 1e6:.1f} MB)" if ok else "❌ bundle weights differ from state_dict")
+    return ok
+
+
+# -----------------------------------------------------------------------------
+# export / check
+# -----------------------------------------------------------------------------
+def _read_texts(path: str | None) -> list[str]:
+    from simple_social_sentiment.backends import PARITY_TEXTS
+
+    if not path:
+        return list(PARITY_TEXTS)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _check(reference, candidate, tokenizer, texts: list[str], min_agreement: float) -> bool:
+    from simple_social_sentiment.backends import parity_report
+
+    report = parity_report(reference, candidate, tokenizer, texts)
+    print(
+        f"🔎 parity on {report['texts']} texts: agreement {report['agreement']:.2%}, "
+        f"max |Δlogit| {report['max_abs_logit_diff']:.4f}"
+    )
+    ok = report["agreement"] >= min_agreement
+    print("✅ parity ok" if ok else f"❌ agreement below {min_agreement:.2%}")
+    return ok
+
+
+def export(fmt: str, state: str, out: str | None, int8: bool, texts: list[str], min_agreement: float) -> bool:
+    from simple_social_sentiment.backends import (
+        OnnxModel,
+        export_onnx,
+        export_torchscript,
+        quantize_int8,
+        quantize_onnx_int8,
+    )
+    from simple_social_sentiment.model import load_fp32_model, load_tokenizer
+
+    device = torch.device("cpu")
+    reference = load_fp32_model(state, device)
+    tokenizer = load_tokenizer()
+    suffix = ".int8" if int8 else ""
+
+    if fmt == "torchscript":
+        out = out or f"models/model{suffix}.ts"
+        model = quantize_int8(load_fp32_model(state, device)) if int8 else reference
+        print(f"⏳ Tracing TorchScript -> {out}")
+        export_torchscript(model, tokenizer, out)
+        candidate = torch.jit.load(out, map_location=device).eval()
+    else:
+        out = out or f"models/model{suffix}.onnx"
+        print(f"⏳ Exporting ONNX -> {out}")
+        if int8:
+            with tempfile.TemporaryDirectory() as tmp:
+                fp32_path = os.path.join(tmp, "model.onnx")
+                export_onnx(reference, tokenizer, fp32_path)
+                quantize_onnx_int8(fp32_path, out)
+        else:
+            export_onnx(reference, tokenizer, out)
+        candidate = OnnxModel(out)
+
+    print(f"💾 saved {out} ({os.path.getsize(out) / 1e6:.1f} MB)")
+    return _check(reference, candidate, tokenizer, texts, min_agreement)
+
+
+def check(backend: str, state: str, artifact: str | None, texts: list[str], min_agreement: float) -> bool:
+    from simple_social_sentiment.model import load_fp32_model, load_runtime
+
+    candidate = load_runtime(model_path=state, backend=backend, device=torch.device("cpu"), artifact_path=artifact)
+    reference = load_fp32_model(state, torch.device("cpu"))
+    return _check(reference, candidate.model, candidate.tokenizer, texts, min_agreement)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command")
+
+    p_clean = sub.add_parser("clean", help="legacy pickle -> state_dict")
+    p_clean.add_argument("--src", default="models/bert.pth")
+    p_clean.add_argument("--dest", default="models/bert_clean.pth")
+
+    p_bundle = sub.add_parser("bundle", help="state_dict -> Offline-Bundle (safetensors)")
+    p_bundle.add_argument("--state", default="models/bert_clean.pth")
+    p_bundle.add_argument("--out", default="models/bundle")
+
+    for name in ("export", "check"):
+        p = sub.add_parser(name)
+        p.add_argument("--state", default="models/bert_clean.pth", help="fp32 state_dict (Referenz)")
+        p.add_argument("--texts", help="Textdatei, eine Zeile pro Post (Default: eingebaute Beispielsätze)")
+        p.add_argument("--min-agreement", type=float, default=0.98)
+        if name == "export":
+            p.add_argument("--format", choices=["onnx", "torchscript"], required=True)
+            p.add_argument("--int8", action="store_true", help="dynamisch int8-quantisieren")
+            p.add_argument("--out")
+        else:
+            p.add_argument("--backend", choices=["int8", "torchscript", "onnx"], required=True)
+            p.add_argument("--artifact", help="exportierte Datei (.ts/.onnx), Default aus SENTIMENT_*_PATH")
+
+    args = parser.parse_args(argv)
+    if args.command in (None, "clean"):
+        clean(getattr(args, "src", "models/bert.pth"), getattr(args, "dest", "models/bert_clean.pth"))
+        return 0
+    if args.command == "bundle":
+        return 0 if bundle(args.state, args.out) else 1
+
+    texts = _read_texts(args.texts)
+    if args.command == "export":
+        ok = export(args.format, args.state, args.out, args.int8, texts, args.min_agreement)
+    else:
+        ok = check(args.backend, args.state, args.artifact, texts, args.min_agreement)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+from typing import Callable, Iterable
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+# Welcher Inferenz-Pfad in load_runtime() benutzt wird:
+#   eager       – fp32 PyTorch (Default, wie bisher)
+#   int8        – fp32-Gewichte laden, Linear-Layer dynamisch auf int8 quantisieren (nur CPU)
+#   torchscript – exportierter Graph aus scripts/convert_model.py (optional schon int8)
+#   onnx        – ONNX Runtime mit exportiertem Graph (optional int8-quantisiert)
+BACKENDS = ("eager", "int8", "torchscript", "onnx")
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "eager").strip().lower()
+TORCHSCRIPT_PATH = os.getenv("SENTIMENT_TORCHSCRIPT_PATH", "/app/model.ts")
+ONNX_PATH = os.getenv("SENTIMENT_ONNX_PATH", "/app/model.onnx")
+
+# Kurze Beispielsätze für Export (Tracing) und Paritätscheck, wenn keine eigenen Texte da sind
+PARITY_TEXTS = [
+    "Heute war ein wunderschöner Tag am See!",
+    "Das Essen war leider kalt und der Service unfreundlich.",
+    "Der Zug fährt um 8 Uhr.",
+    "Ich liebe diese App 😊",
+    "So ein Mist, schon wieder Stau.",
+    "Kaffee mit Freunden – einfach herrlich.",
+    "Die Sitzung wurde auf Donnerstag verschoben.",
+    "Total enttäuschend, nie wieder.",
+]
+
+# Forward-Signatur aller Backends: (input_ids, attention_mask) -> Logits [batch, n_classes]
+Forward = Callable[[torch.Tensor, torch.Tensor], torch.Tensor]
+
+
+def quantize_int8(model: nn.Module) -> nn.Module:
+    """Dynamische int8-Quantisierung aller nn.Linear (Gewichte int8, Aktivierungen zur Laufzeit)."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxModel:
+    """ONNX-Runtime-Session, aufrufbar wie das PyTorch-Modell."""
+
+    def __init__(self, path: str, num_threads: int | None = None):
+        if ort is None:
+            raise RuntimeError("SENTIMENT_BACKEND=onnx requires onnxruntime (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        (logits,) = self.session.run(
+            ["logits"],
+            {
+                "input_ids": input_ids.cpu().numpy().astype(np.int64),
+                "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+            },
+        )
+        return torch.from_numpy(logits)
+
+
+def example_inputs(tokenizer, texts: Iterable[str] = PARITY_TEXTS[:2]) -> tuple[torch.Tensor, torch.Tensor]:
+    enc = tokenizer(list(texts), return_tensors="pt", truncation=True, padding=True, max_length=128)
+    return enc["input_ids"], enc["attention_mask"]
+
+
+def export_torchscript(model: nn.Module, tokenizer, path: str) -> None:
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, example_inputs(tokenizer), strict=False)
+    traced = torch.jit.freeze(traced) if not _is_quantized(model) else traced
+    torch.jit.save(traced, path)
+
+
+def export_onnx(model: nn.Module, tokenizer, path: str, opset: int = 17) -> None:
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            example_inputs(tokenizer),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "logits": {0: "batch"}},
+            opset_version=opset,
+            dynamo=False,
+        )
+
+
+def quantize_onnx_int8(src: str, dest: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dest, weight_type=QuantType.QInt8)
+
+
+def load_backend(
+    backend: str,
+    build_fp32: Callable[[], nn.Module],
+    device: torch.device,
+    artifact_path: str | None = None,
+) -> Forward:
+    """
+    Liefert das Modell für das gewünschte Backend. build_fp32() wird nur aufgerufen,
+    wenn die fp32-Gewichte wirklich gebraucht werden (nicht bei torchscript/onnx).
+    artifact_path überschreibt SENTIMENT_TORCHSCRIPT_PATH / SENTIMENT_ONNX_PATH.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown SENTIMENT_BACKEND={backend!r} (expected one of {', '.join(BACKENDS)})")
+    if backend in ("int8", "onnx") and device.type != "cpu":
+        raise ValueError(f"SENTIMENT_BACKEND={backend} only runs on CPU")
+
+    if backend == "eager":
+        return build_fp32()
+    if backend == "int8":
+        return quantize_int8(build_fp32())
+    if backend == "torchscript":
+        return torch.jit.load(artifact_path or TORCHSCRIPT_PATH, map_location=device).eval()
+    return OnnxModel(artifact_path or ONNX_PATH)
+
+
+def _is_quantized(model: nn.Module) -> bool:
+    return any("quantized" in type(m).__module__ for m in model.modules())
+
+
+def parity_report(
+    reference: Forward,
+    candidate: Forward,
+    tokenizer,
+    texts: list[str],
+    *,
+    batch_size: int = 32,
+    max_length: int = 512,
+) -> dict:
+    """Vergleicht Vorhersagen und Logits eines Backends mit dem fp32-Referenzmodell."""
+    agree = 0
+    max_diff = 0.0
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i:i + batch_size], return_tensors="pt", truncation=True, padding=True, max_length=max_length)
+        with torch.inference_mode():
+            ref = reference(enc["input_ids"], enc["attention_mask"]).float()
+            cand = candidate(enc["input_ids"], enc["attention_mask"]).float()
+        agree += int((ref.argmax(-1) == cand.argmax(-1)).sum())
+        max_diff = max(max_diff, float((ref - cand).abs().max()))
+    n = len(texts)
+    return {"texts": n, "agreement": agree / n if n else 1.0, "max_abs_logit_diff": max_diff}
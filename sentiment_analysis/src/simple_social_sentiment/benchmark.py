@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import torch
+from transformers import BertConfig, BertTokenizerFast
+
+from .backends import BACKENDS, export_onnx, export_torchscript, load_backend, ort
+from .model import LABELS, SentimentClassifier, SentimentRuntime, predict_batch
+
+
+# Kleines, zufällig initialisiertes BERT: läuft offline ohne Checkpoint/Hub.
+# Absolute Zahlen sind nicht die von bert-base, Verhältnisse (Batchgröße, Länge,
+# Threads, Backend) und Regressionen zwischen Commits aber schon.
+SMALL_BERT = {
+    "vocab_size": 2000,
+    "hidden_size": 256,
+    "num_hidden_layers": 4,
+    "num_attention_heads": 4,
+    "intermediate_size": 1024,
+    "max_position_embeddings": 512,
+}
+
+_SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def random_tokenizer(vocab_size: int, workdir: str) -> BertTokenizerFast:
+    """Wort-Vokabular w0..wN: jedes Wort ist genau ein Token, Längen sind damit exakt steuerbar."""
+    vocab = Path(workdir) / "vocab.txt"
+    words = [f"w{i}" for i in range(vocab_size - len(_SPECIAL_TOKENS))]
+    vocab.write_text("\n".join(_SPECIAL_TOKENS + words), encoding="utf-8")
+    return BertTokenizerFast(str(vocab))
+
+
+def make_texts(n: int, tokens: int, vocab_size: int = SMALL_BERT["vocab_size"], seed: int = 0) -> list[str]:
+    """n Texte mit genau `tokens` Tokens inkl. [CLS]/[SEP]."""
+    rng = random.Random(seed)
+    words = vocab_size - len(_SPECIAL_TOKENS)
+    return [" ".join(f"w{rng.randrange(words)}" for _ in range(max(tokens - 2, 1))) for _ in range(n)]
+
+
+def random_runtime(backend: str, workdir: str, config: dict = SMALL_BERT, seed: int = 0) -> SentimentRuntime:
+    """
+    Runtime mit Zufallsgewichten für `backend`; torchscript/onnx werden dafür nach
+    `workdir` exportiert. ONNX übernimmt torch.get_num_threads() beim Laden.
+    """
+    torch.manual_seed(seed)
+    device = torch.device("cpu")
+    tokenizer = random_tokenizer(config["vocab_size"], workdir)
+    model = SentimentClassifier(n_classes=len(LABELS), config=BertConfig(**config)).eval()
+
+    artifact = None
+    if backend == "torchscript":
+        artifact = os.path.join(workdir, "model.ts")
+        export_torchscript(model, tokenizer, artifact)
+    elif backend == "onnx":
+        artifact = os.path.join(workdir, "model.onnx")
+        export_onnx(model, tokenizer, artifact)
+    forward = load_backend(backend, lambda: model, device, artifact)
+    return SentimentRuntime(model=forward, tokenizer=tokenizer, device=device, backend=backend)
+
+
+def available_backends() -> list[str]:
+    return [b for b in BACKENDS if b != "onnx" or ort is not None]
+
+
+@dataclass
+class BenchResult:
+    backend: str
+    threads: int
+    batch_size: int
+    seq_len: int
+    repeat: int
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    texts_per_second: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.backend}/t{self.threads}/b{self.batch_size}/s{self.seq_len}"
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(runtime: SentimentRuntime, texts: list[str], *, threads: int, repeat: int, warmup: int = 3) -> BenchResult:
+    """Latenz pro predict_batch()-Aufruf (ein Batch = alle `texts`) und Durchsatz in Texten/s."""
+    for _ in range(warmup):
+        predict_batch(runtime, texts)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_batch(runtime, texts)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    ms = [x * 1000 for x in latencies]
+    return BenchResult(
+        backend=runtime.backend,
+        threads=threads,
+        batch_size=len(texts),
+        seq_len=len(runtime.tokenizer(texts[0])["input_ids"]),
+        repeat=repeat,
+        mean_ms=statistics.fmean(ms),
+        p50_ms=_percentile(ms, 0.50),
+        p90_ms=_percentile(ms, 0.90),
+        p99_ms=_percentile(ms, 0.99),
+        texts_per_second=len(texts) * repeat / sum(latencies),
+    )
+
+
+def run_matrix(
+    backends: list[str],
+    threads: list[int],
+    batch_sizes: list[int],
+    seq_lens: list[int],
+    *,
+    repeat: int = 20,
+    config: dict = SMALL_BERT,
+    progress=print,
+) -> list[BenchResult]:
+    results = []
+    for backend in backends:
+        for n_threads in threads:
+            torch.set_num_threads(n_threads)
+            with tempfile.TemporaryDirectory() as workdir:
+                runtime = random_runtime(backend, workdir, config)
+                for seq_len in seq_lens:
+                    for batch_size in batch_sizes:
+                        texts = make_texts(batch_size, seq_len, config["vocab_size"])
+                        result = measure(runtime, texts, threads=n_threads, repeat=repeat)
+                        results.append(result)
+                        if progress:
+                            progress(
+                                f"{result.key:<24} p50 {result.p50_ms:8.2f} ms  p99 {result.p99_ms:8.2f} ms  "
+                                f"{result.texts_per_second:9.1f} texts/s"
+                            )
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def report(results: list[BenchResult], config: dict = SMALL_BERT) -> dict:
+    """JSON-fähiger Bericht; `results` sind über BenchResult.key zwischen Commits vergleichbar."""
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "model_config": config,
+        },
+        "results": {r.key: asdict(r) for r in results},
+    }
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import random
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from .model import LABELS, SentimentRuntime, predict_batch
+
+
+# Zweistufig: ein linearer Klassifikator über gehashte Wort-n-Gramme entscheidet die
+# eindeutigen Fälle in Mikrosekunden, nur unsichere Texte gehen an BERT.
+# Ohne Modell-Datei (scripts/cascade.py train) ist die Kaskade aus.
+CASCADE_PATH = os.getenv("SENTIMENT_CASCADE_PATH", "/app/cascade.npz")
+CASCADE_THRESHOLD = float(os.getenv("SENTIMENT_CASCADE_THRESHOLD", "0.9"))
+# Nur diese Labels darf die Vorstufe allein vergeben. "Negative" lässt das Backend den Post
+# ablehnen – das entscheidet immer BERT.
+FAST_LABELS = frozenset({"Positive", "Neutral"})
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def ngram_features(text: str, dims: int) -> np.ndarray:
+    """Indizes der gehashten Uni- und Bigramme (crc32: stabil über Prozesse, anders als hash())."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % dims for g in grams), dtype=np.int64, count=len(grams))
+
+
+class HashedNgramClassifier:
+    """Multinomiale logistische Regression auf gehashten n-Grammen (Gewichte [dims, n_classes])."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray):
+        self.weights = weights
+        self.bias = bias
+        self.dims = weights.shape[0]
+
+    @classmethod
+    def empty(cls, dims: int = 2**18) -> "HashedNgramClassifier":
+        return cls(np.zeros((dims, len(LABELS)), dtype=np.float32), np.zeros(len(LABELS), dtype=np.float32))
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"])
+
+    def save(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias)
+
+    def proba(self, text: str) -> np.ndarray:
+        logits = self.weights[ngram_features(text, self.dims)].sum(axis=0) + self.bias
+        logits = np.exp(logits - logits.max())
+        return logits / logits.sum()
+
+    def fit(
+        self,
+        texts: list[str],
+        labels: list[int],
+        *,
+        epochs: int = 5,
+        lr: float = 0.1,
+        l2: float = 1e-6,
+        seed: int = 0,
+    ) -> "HashedNgramClassifier":
+        """SGD mit Kreuzentropie; in der Praxis auf Labels des großen Modells (Distillation)."""
+        features = [ngram_features(t, self.dims) for t in texts]
+        order = list(range(len(texts)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            step = lr / (1 + epoch)
+            for i in order:
+                idx = features[i]
+                logits = self.weights[idx].sum(axis=0) + self.bias
+                p = np.exp(logits - logits.max())
+                p /= p.sum()
+                p[labels[i]] -= 1.0  # Gradient der Kreuzentropie nach den Logits
+                if l2:
+                    self.weights[idx] *= 1 - step * l2
+                np.add.at(self.weights, idx, -step * p)
+                self.bias -= step * p
+        return self
+
+
+class SentimentCascade:
+    """
+    predict_batch() mit Vorstufe: Texte, die das schnelle Modell mit Wahrscheinlichkeit
+    >= threshold als Positive/Neutral einstuft, bekommen dieses Label; der Rest
+    (unsicher oder Negative-Kandidat) läuft gemeinsam gebatcht durch BERT.
+    """
+
+    def __init__(self, fast: HashedNgramClassifier, threshold: float = CASCADE_THRESHOLD):
+        self.fast = fast
+        self.threshold = threshold
+        self.total = 0
+        self.offloaded = 0
+
+    def route(self, texts: list[str]) -> tuple[list[str | None], list[int]]:
+        """Labels der sicheren Positive/Neutral-Texte (sonst None) und die Indizes, die BERT braucht."""
+        labels: list[str | None] = []
+        uncertain = []
+        for i, text in enumerate(texts):
+            p = self.fast.proba(text)
+            best = int(p.argmax())
+            if p[best] >= self.threshold and LABELS[best] in FAST_LABELS:
+                labels.append(LABELS[best])
+            else:
+                labels.append(None)
+                uncertain.append(i)
+        return labels, uncertain
+
+    def predict_batch(self, runtime: SentimentRuntime, texts: list[str]) -> list[str]:
+        labels, uncertain = self.route(texts)
+        if uncertain:
+            for i, label in zip(uncertain, predict_batch(runtime, [texts[i] for i in uncertain])):
+                labels[i] = label
+        self.total += len(texts)
+        self.offloaded += len(texts) - len(uncertain)
+        return labels
+
+
+def load_cascade(path: str | None = None, threshold: float | None = None) -> SentimentCascade | None:
+    path = path or CASCADE_PATH
+    if not Path(path).is_file():
+        return None
+    return SentimentCascade(HashedNgramClassifier.load(path), CASCADE_THRESHOLD if threshold is None else threshold)
@@ -6,12 +6,23 @@ import time
 
 import pika
 
-from .model import load_runtime, predict
+from .cascade import SentimentCascade, load_cascade
+from .model import SentimentRuntime, load_runtime, predict_batch
 
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
 RPC_QUEUE = os.getenv("SENTIMENT_RPC_QUEUE", "sentiment_rpc_queue")
 
+# Micro-Batching: bis zu MAX_BATCH_SIZE Anfragen oder MAX_WAIT_MS ab der ersten sammeln,
+# dann ein gemeinsamer (gepaddeter) Forward-Pass.
+MAX_BATCH_SIZE = int(os.getenv("SENTIMENT_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", "5"))
+# Prefetch > Batchgröße, damit der nächste Batch schon unterwegs ist, während gerechnet wird
+PREFETCH_COUNT = int(os.getenv("SENTIMENT_PREFETCH", str(2 * MAX_BATCH_SIZE)))
+STATS_INTERVAL_SECONDS = float(os.getenv("SENTIMENT_STATS_INTERVAL_SECONDS", "60"))
+# >1: Supervisor lädt das Modell einmal und forkt so viele Consumer (siehe supervisor.py)
+WORKERS = int(os.getenv("SENTIMENT_WORKERS", "1"))
+
 
 def connect_rabbitmq():
     creds = pika.PlainCredentials(
@@ -27,35 +38,159 @@ def connect_rabbitmq():
             time.sleep(2)
 
 
-def main() -> int:
-    runtime = load_runtime()
+class ThroughputStats:
+    """Zählt Nachrichten/Batches und gibt alle `interval` Sekunden eine Zeile aus."""
 
-    connection = connect_rabbitmq()
-    channel = connection.channel()
-    channel.queue_declare(queue=RPC_QUEUE, durable=True)
+    def __init__(self, interval: float = STATS_INTERVAL_SECONDS, name: str = "sentiment"):
+        self.interval = interval
+        self.name = name
+        self._reset(time.monotonic())
 
-    def on_request(ch, method, props, body):
-        try:
-            msg = json.loads(body)
-            text = msg.get("text", "")
+    def _reset(self, now: float) -> None:
+        self.started = now
+        self.messages = 0
+        self.batches = 0
+        self.offloaded = 0
+        self.inference_seconds = 0.0
 
-            sentiment = predict(runtime, text)
-            response = json.dumps({"sentiment": sentiment})
+    def record(self, batch_size: int, inference_seconds: float, offloaded: int = 0) -> None:
+        self.messages += batch_size
+        self.batches += 1
+        self.offloaded += offloaded
+        self.inference_seconds += inference_seconds
+        now = time.monotonic()
+        if self.interval > 0 and now - self.started >= self.interval:
+            self.report(now)
 
-            ch.basic_publish(
-                exchange="",
-                routing_key=props.reply_to,
-                properties=pika.BasicProperties(correlation_id=props.correlation_id),
-                body=response,
+    def report(self, now: float | None = None) -> None:
+        now = now or time.monotonic()
+        elapsed = max(now - self.started, 1e-9)
+        if self.batches:
+            print(
+                f"[{self.name}] {self.messages} msgs in {self.batches} batches "
+                f"(avg {self.messages / self.batches:.1f}/batch), "
+                f"{self.messages / elapsed:.1f} msg/s, "
+                f"{1000 * self.inference_seconds / self.batches:.1f} ms/forward"
+                + (f", {self.offloaded / self.messages:.0%} via cascade" if self.offloaded else "")
             )
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+        self._reset(now)
+
+
+def _classify(runtime: SentimentRuntime, texts: list[str], cascade: SentimentCascade | None) -> tuple[list[str], int]:
+    """Labels + Anzahl der Texte, die die Kaskade ohne BERT entschieden hat."""
+    if cascade is None:
+        return predict_batch(runtime, texts), 0
+    before = cascade.offloaded
+    sentiments = cascade.predict_batch(runtime, texts)
+    return sentiments, cascade.offloaded - before
+
+
+def _reply(channel, props, sentiment: str) -> None:
+    channel.basic_publish(
+        exchange="",
+        routing_key=props.reply_to,
+        properties=pika.BasicProperties(correlation_id=props.correlation_id),
+        body=json.dumps({"sentiment": sentiment}),
+    )
+
+
+def _handle_one_by_one(channel, runtime: SentimentRuntime, requests: list[tuple], cascade: SentimentCascade | None) -> None:
+    # Batch ist fehlgeschlagen: einzeln nachrechnen, damit ein kaputter Text nicht die
+    # anderen Anfragen mitreißt. Nur was auch allein scheitert, wird verworfen
+    # (bzw. landet im Dead-Letter-Exchange, falls die Queue einen hat).
+    for method, props, text in requests:
+        try:
+            (sentiment,), _ = _classify(runtime, [text], cascade)
+        except Exception as e:
+            print(f"Error: {e} (delivery {method.delivery_tag} dropped)")
+            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            continue
+        _reply(channel, props, sentiment)
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+
+
+def handle_batch(
+    channel,
+    runtime: SentimentRuntime,
+    batch: list[tuple],
+    stats: ThroughputStats,
+    cascade: SentimentCascade | None = None,
+) -> None:
+    """Einen Micro-Batch (arrived_at, method, props, body) beantworten und bestätigen."""
+    requests = []
+    for _, method, props, body in batch:
+        try:
+            text = json.loads(body).get("text", "")
+            if not isinstance(text, str):
+                raise ValueError(f"text must be a string, got {type(text).__name__}")
+            requests.append((method, props, text))
         except Exception as e:
             print(f"Error: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag)
+            # wird auch beim nächsten Versuch nicht gültig -> verwerfen statt endlos neu zustellen
+            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+    if not requests:
+        return
 
-    channel.basic_qos(prefetch_count=1)
+    try:
+        start = time.perf_counter()
+        sentiments, offloaded = _classify(runtime, [text for _, _, text in requests], cascade)
+        stats.record(len(requests), time.perf_counter() - start, offloaded)
+    except Exception as e:
+        print(f"Error: {e} (batch of {len(requests)}, retrying one by one)")
+        _handle_one_by_one(channel, runtime, requests, cascade)
+        return
+
+    for (_, props, _), sentiment in zip(requests, sentiments):
+        _reply(channel, props, sentiment)
+    # ein Ack-Frame für den ganzen Batch (alle kleineren Tags sind bereits erledigt)
+    channel.basic_ack(delivery_tag=requests[-1][0].delivery_tag, multiple=True)
+
+
+def serve(runtime: SentimentRuntime, name: str = "sentiment") -> None:
+    """Ein Consumer: eigene Verbindung, Micro-Batching, läuft bis der Prozess beendet wird."""
+    connection = connect_rabbitmq()
+    channel = connection.channel()
+    channel.queue_declare(queue=RPC_QUEUE, durable=True)
+
+    pending: list[tuple] = []  # (arrived_at, method, props, body)
+    stats = ThroughputStats(name=name)
+    cascade = load_cascade()
+
+    def on_request(ch, method, props, body):
+        pending.append((time.monotonic(), method, props, body))
+
+    channel.basic_qos(prefetch_count=PREFETCH_COUNT)
     channel.basic_consume(queue=RPC_QUEUE, on_message_callback=on_request)
 
-    print("🐰 Sentiment RPC Service Ready...")
-    channel.start_consuming()
-    return 0
\ No newline at end of file
+    print(
+        f"🐰 Sentiment RPC Service Ready ({name})... "
+        f"(batch<={MAX_BATCH_SIZE}, wait<={MAX_WAIT_MS}ms, prefetch={PREFETCH_COUNT}, "
+        f"backend={runtime.backend}, startup_seconds={runtime.load_seconds:.2f}, "
+        f"cascade={'off' if cascade is None else f'threshold {cascade.threshold}'})"
+    )
+    max_wait = MAX_WAIT_MS / 1000.0
+    while True:
+        if not pending:
+            connection.process_data_events(time_limit=1)
+            continue
+
+        # auffüllen, bis der Batch voll oder die Wartezeit ab der ersten Anfrage um ist
+        deadline = pending[0][0] + max_wait
+        while len(pending) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            connection.process_data_events(time_limit=remaining)
+
+        batch = pending[:MAX_BATCH_SIZE]
+        del pending[:MAX_BATCH_SIZE]
+        handle_batch(channel, runtime, batch, stats, cascade)
+
+
+def main() -> int:
+    if WORKERS > 1:
+        from .supervisor import Supervisor
+
+        return Supervisor(WORKERS).run()
+    serve(load_runtime())
+    return 0
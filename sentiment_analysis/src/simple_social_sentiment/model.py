@@ -1,24 +1,38 @@
 from __future__ import annotations
 
 import os
+import time
 from dataclasses import dataclass
+from pathlib import Path
 
 import torch
 import torch.nn as nn
-import torch.nn.functional as F
-from transformers import AutoTokenizer, BertModel
+from safetensors.torch import load_file, save_file
+from transformers import AutoTokenizer, BertConfig, BertModel
+
+from .backends import SENTIMENT_BACKEND, Forward, load_backend
 
 
 BASE_MODEL_NAME = os.getenv("SENTIMENT_BASE_MODEL", "dbmdz/bert-base-german-cased")
 MODEL_PATH = os.getenv("MODEL_PATH", "/app/model.pth")
+# Offline-Bundle (config.json + model.safetensors + Tokenizer), erzeugt mit
+# scripts/convert_model.py bundle. Liegt es vor, wird nichts vom Hub geladen.
+BUNDLE_DIR = os.getenv("SENTIMENT_BUNDLE_DIR", "/app/bundle")
 
 LABELS = {0: "Negative", 1: "Neutral", 2: "Positive"}
 
+# Posts sind kurz: 128 Tokens reichen fast immer, längere Texte werden abgeschnitten.
+MAX_LENGTH = int(os.getenv("SENTIMENT_MAX_LENGTH", "128"))
+# Texte eines Batches werden nach Tokenlänge sortiert und in Buckets gerechnet,
+# innerhalb eines Buckets unterscheiden sich die Längen um höchstens BUCKET_WIDTH Tokens.
+BUCKET_WIDTH = int(os.getenv("SENTIMENT_BUCKET_WIDTH", "32"))
+
 
 class SentimentClassifier(nn.Module):
-    def __init__(self, n_classes: int = 3):
+    def __init__(self, n_classes: int = 3, config: BertConfig | None = None):
         super().__init__()
-        self.bert = BertModel.from_pretrained(BASE_MODEL_NAME)
+        # mit config: nur die Architektur bauen, die Gewichte kommen danach aus dem Bundle
+        self.bert = BertModel(config) if config is not None else BertModel.from_pretrained(BASE_MODEL_NAME)
         self.drop = nn.Dropout(p=0.3)
         self.out = nn.Linear(self.bert.config.hidden_size, n_classes)
 
@@ -31,48 +45,202 @@ class SentimentClassifier(nn.Module):
 
 @dataclass
 class SentimentRuntime:
-    model: SentimentClassifier
+    model: Forward  # SentimentClassifier, quantisiert, TorchScript oder ONNX – gleiche Signatur
     tokenizer: any
     device: torch.device
+    backend: str = "eager"
+    load_seconds: float = 0.0  # Startzeit-Metrik: Tokenizer + Modell laden
+
+
+def load_fp32_model(path: str, device: torch.device) -> SentimentClassifier:
+    model = SentimentClassifier(n_classes=3)
+    state = torch.load(path, map_location=device)
+    model.load_state_dict(state)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def has_bundle(bundle_dir: str | None = None) -> bool:
+    return (Path(bundle_dir or BUNDLE_DIR) / "model.safetensors").is_file()
+
+
+def _materialize_buffers(model: nn.Module) -> None:
+    # nicht-persistente Buffer (BertEmbeddings) stehen nicht im state_dict und sind nach
+    # dem Bau auf "meta" noch leer -> so wie BertEmbeddings sie selbst anlegt
+    for module in model.modules():
+        for name, buf in list(module._buffers.items()):
+            if buf is None or not buf.is_meta:
+                continue
+            if name == "position_ids":
+                module._buffers[name] = torch.arange(buf.shape[-1]).expand(buf.shape)
+            elif name == "token_type_ids":
+                module._buffers[name] = torch.zeros(buf.shape, dtype=torch.long)
+            else:
+                raise RuntimeError(f"buffer {name!r} not in bundle")
+
+
+def load_bundled_model(bundle_dir: str, device: torch.device) -> SentimentClassifier:
+    """
+    Ein einziger Ladevorgang: Architektur aus config.json auf dem meta-Device (keine
+    Zufallsinitialisierung, kein Speicher), Gewichte per mmap aus model.safetensors.
+    """
+    config = BertConfig.from_json_file(str(Path(bundle_dir) / "config.json"))
+    with torch.device("meta"):
+        model = SentimentClassifier(n_classes=len(LABELS), config=config)
+    state = load_file(str(Path(bundle_dir) / "model.safetensors"), device="cpu")
+    model.load_state_dict(state, assign=True)
+    _materialize_buffers(model)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def save_bundle(
+    state: dict[str, torch.Tensor],
+    out_dir: str,
+    tokenizer=None,
+    config: BertConfig | None = None,
+) -> None:
+    """
+    state_dict (z.B. bert_clean.pth) -> Bundle-Verzeichnis für load_bundled_model().
+    Ohne config wird die von BASE_MODEL_NAME geladen (Hub oder HF-Cache).
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    config = config or BertConfig.from_pretrained(BASE_MODEL_NAME)
+    with torch.device("meta"):
+        expected = SentimentClassifier(n_classes=len(LABELS), config=config).state_dict().keys()
+    # ältere Checkpoints enthalten noch Buffer wie embeddings.position_ids
+    weights = {k: v.contiguous() for k, v in state.items() if k in expected}
+    missing = set(expected) - set(weights)
+    if missing:
+        raise ValueError(f"state_dict does not match the BERT config: missing {sorted(missing)[:5]}")
+    config.save_pretrained(out)
+    save_file(weights, str(out / "model.safetensors"), metadata={"format": "pt"})
+    (tokenizer or load_tokenizer()).save_pretrained(out)
+
+
+def load_tokenizer():
+    if (Path(BUNDLE_DIR) / "tokenizer_config.json").is_file():
+        return AutoTokenizer.from_pretrained(BUNDLE_DIR, local_files_only=True)
+    return AutoTokenizer.from_pretrained(BASE_MODEL_NAME)
 
 
 def load_runtime(
     *,
     model_path: str | None = None,
     device: torch.device | None = None,
+    backend: str | None = None,
+    artifact_path: str | None = None,
 ) -> SentimentRuntime:
     """
-    Lädt Tokenizer + Modell (state_dict) und gibt ein Runtime-Objekt zurück.
+    Lädt Tokenizer + Modell und gibt ein Runtime-Objekt zurück.
+    Das Backend kommt aus SENTIMENT_BACKEND (eager | int8 | torchscript | onnx).
+    Ohne explizites model_path wird das Offline-Bundle bevorzugt (falls vorhanden).
     """
+    started = time.perf_counter()
+    backend = (backend or SENTIMENT_BACKEND).strip().lower()
+    if backend in ("int8", "onnx"):
+        device = torch.device("cpu")
     device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    path = model_path or MODEL_PATH
 
-    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL_NAME)
+    if model_path is None and has_bundle():
+        build_fp32 = lambda: load_bundled_model(BUNDLE_DIR, device)
+    else:
+        build_fp32 = lambda: load_fp32_model(model_path or MODEL_PATH, device)
 
-    model = SentimentClassifier(n_classes=3)
-    state = torch.load(path, map_location=device)
-    model.load_state_dict(state)
-    model.to(device)
-    model.eval()
+    tokenizer = load_tokenizer()
+    model = load_backend(backend, build_fp32, device, artifact_path)
 
-    return SentimentRuntime(model=model, tokenizer=tokenizer, device=device)
+    return SentimentRuntime(
+        model=model,
+        tokenizer=tokenizer,
+        device=device,
+        backend=backend,
+        load_seconds=time.perf_counter() - started,
+    )
 
 
-def predict(runtime: SentimentRuntime, text: str) -> str:
+def length_buckets(lengths: list[int], width: int = BUCKET_WIDTH) -> list[list[int]]:
     """
-    Macht eine Vorhersage für einen Text und gibt das Label zurück.
+    Gruppiert Indizes nach Länge: aufsteigend sortiert, neuer Bucket sobald ein Text
+    mehr als `width` Tokens länger ist als der kürzeste im aktuellen Bucket.
     """
-    inputs = runtime.tokenizer(
-        text, return_tensors="pt", truncation=True, padding=True, max_length=512
-    )
-    inputs = {k: v.to(runtime.device) for k, v in inputs.items()}
-
-    with torch.no_grad():
-        outputs = runtime.model(
-            input_ids=inputs["input_ids"],
-            attention_mask=inputs["attention_mask"],
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    buckets: list[list[int]] = []
+    for i in order:
+        if not buckets or (width > 0 and lengths[i] - lengths[buckets[-1][0]] > width):
+            buckets.append([])
+        buckets[-1].append(i)
+    return buckets
+
+
+def tokenize_buckets(
+    tokenizer,
+    texts: list[str],
+    *,
+    max_length: int = MAX_LENGTH,
+    width: int = BUCKET_WIDTH,
+) -> list[tuple[list[int], dict[str, torch.Tensor]]]:
+    """
+    Tokenisiert einmal ohne Padding und paddet dann jeden Längen-Bucket nur auf
+    seinen eigenen längsten Text. Liefert (Indizes in `texts`, Tensoren) pro Bucket.
+    """
+    encoded = tokenizer(texts, truncation=True, max_length=max_length)
+    ids, mask = encoded["input_ids"], encoded["attention_mask"]
+    batches = []
+    for bucket in length_buckets([len(x) for x in ids], width):
+        padded = tokenizer.pad(
+            {"input_ids": [ids[i] for i in bucket], "attention_mask": [mask[i] for i in bucket]},
+            return_tensors="pt",
+            pad_to_multiple_of=8,
         )
-        probabilities = F.softmax(outputs, dim=-1)
-        pred = torch.argmax(probabilities, dim=-1).item()
+        batches.append((bucket, padded))
+    return batches
 
-    return LABELS[pred]
+
+def predict_logits(runtime: SentimentRuntime, texts: list[str]) -> torch.Tensor:
+    """
+    Logits [len(texts), n_classes] in Eingabereihenfolge; ein Forward-Pass pro Längen-Bucket.
+    """
+    logits = torch.empty((len(texts), len(LABELS)), dtype=torch.float32)
+    with torch.inference_mode():
+        for bucket, inputs in tokenize_buckets(runtime.tokenizer, texts):
+            out = runtime.model(
+                inputs["input_ids"].to(runtime.device),
+                inputs["attention_mask"].to(runtime.device),
+            )
+            logits[bucket] = out.float().cpu()
+    return logits
+
+
+def predict_batch(runtime: SentimentRuntime, texts: list[str]) -> list[str]:
+    """
+    Vorhersage für mehrere Texte; ähnlich lange Texte teilen sich einen Forward-Pass.
+    """
+    if not texts:
+        return []
+    # argmax über die Logits == argmax über softmax
+    preds = torch.argmax(predict_logits(runtime, texts), dim=-1).tolist()
+    return [LABELS[p] for p in preds]
+
+
+def predict_scores(runtime: SentimentRuntime, texts: list[str]) -> list[tuple[str, dict[str, float]]]:
+    """
+    Label + Klassenwahrscheinlichkeiten (softmax) pro Text, in Eingabereihenfolge.
+    """
+    if not texts:
+        return []
+    probs = torch.softmax(predict_logits(runtime, texts), dim=-1)
+    return [
+        (LABELS[int(row.argmax())], {LABELS[i]: round(float(p), 6) for i, p in enumerate(row)})
+        for row in probs
+    ]
+
+
+def predict(runtime: SentimentRuntime, text: str) -> str:
+    """
+    Macht eine Vorhersage für einen Text und gibt das Label zurück.
+    """
+    return predict_batch(runtime, [text])[0]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from .model import SentimentRuntime, load_runtime, predict_scores
+
+
+# HTTP-Variante des Sentiment-Service (Backfills, interne Tools); der RPC-Consumer
+# in main.py bleibt der Weg für die API. Gleicher gebatchter Inferenz-Pfad.
+HTTP_HOST = os.getenv("HOST", "0.0.0.0")
+HTTP_PORT = int(os.getenv("PORT", "8001"))
+# so viele Texte pro Forward-Aufruf (innerhalb wird noch nach Länge gebucketet)
+HTTP_BATCH_SIZE = int(os.getenv("SENTIMENT_HTTP_BATCH_SIZE", "64"))
+# ab so vielen Texten wird (ohne explizites stream) als NDJSON gestreamt
+STREAM_THRESHOLD = int(os.getenv("SENTIMENT_HTTP_STREAM_THRESHOLD", "256"))
+MAX_TEXTS = int(os.getenv("SENTIMENT_HTTP_MAX_TEXTS", "100000"))
+
+
+class PredictIn(BaseModel):
+    # leere und zu große Batches lehnt die Validierung ab (422)
+    texts: list[str] = Field(min_length=1, max_length=MAX_TEXTS)
+    # None = automatisch ab STREAM_THRESHOLD Texten
+    stream: bool | None = None
+
+
+class PredictionOut(BaseModel):
+    label: str
+    probabilities: dict[str, float]
+
+
+class PredictOut(BaseModel):
+    backend: str
+    results: list[PredictionOut]
+
+
+_runtime: SentimentRuntime | None = None
+# ein Forward zur Zeit: torch nutzt bereits alle Threads, parallele Batches würden sich nur verdrängen.
+# Gesperrt wird pro Chunk, damit gestreamte Großaufträge kleine Anfragen nicht aushungern.
+_inference_lock = asyncio.Lock()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _runtime
+    _runtime = await run_in_threadpool(load_runtime)
+    print(f"🌐 Sentiment HTTP ready (backend={_runtime.backend}, startup_seconds={_runtime.load_seconds:.2f})")
+    yield
+    _runtime = None
+
+
+app = FastAPI(title="Simple Social Sentiment", lifespan=lifespan)
+
+
+async def _score(texts: list[str]) -> list[tuple[str, dict[str, float]]]:
+    async with _inference_lock:
+        return await run_in_threadpool(predict_scores, _runtime, texts)
+
+
+async def _stream(texts: list[str]) -> AsyncIterator[str]:
+    for start in range(0, len(texts), HTTP_BATCH_SIZE):
+        try:
+            scores = await _score(texts[start:start + HTTP_BATCH_SIZE])
+        except Exception as exc:
+            # Status ist schon raus -> Fehler als letzte Zeile
+            yield json.dumps({"error": str(exc), "index": start}) + "\n"
+            return
+        yield "".join(
+            json.dumps({"index": start + i, "label": label, "probabilities": probs}) + "\n"
+            for i, (label, probs) in enumerate(scores)
+        )
+
+
+@app.get("/health")
+async def health():
+    if _runtime is None:
+        raise HTTPException(status_code=503, detail="model not loaded")
+    return {"status": "ok", "backend": _runtime.backend, "startup_seconds": round(_runtime.load_seconds, 3)}
+
+
+@app.post("/predict", response_model=PredictOut)
+async def predict(payload: PredictIn):
+    """
+    Labels + Wahrscheinlichkeiten für eine Liste von Texten.
+    Große Eingaben (oder stream=true) kommen als NDJSON, eine Zeile pro Text, sobald ihr Chunk fertig ist.
+    """
+    if _runtime is None:
+        raise HTTPException(status_code=503, detail="model not loaded")
+
+    stream = payload.stream if payload.stream is not None else len(payload.texts) > STREAM_THRESHOLD
+    if stream:
+        return StreamingResponse(_stream(payload.texts), media_type="application/x-ndjson")
+
+    results = []
+    for start in range(0, len(payload.texts), HTTP_BATCH_SIZE):
+        results.extend(await _score(payload.texts[start:start + HTTP_BATCH_SIZE]))
+    return {
+        "backend": _runtime.backend,
+        "results": [{"label": label, "probabilities": probs} for label, probs in results],
+    }
+
+
+def main():
+    uvicorn.run("simple_social_sentiment.server:app", host=HTTP_HOST, port=HTTP_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import gc
+import multiprocessing as mp
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+import torch
+
+from .backends import SENTIMENT_BACKEND
+from .model import SentimentRuntime, load_runtime
+
+
+# Threads pro Worker: Default = Kerne gleichmäßig auf die Worker verteilt
+THREADS_PER_WORKER = int(os.getenv("SENTIMENT_THREADS_PER_WORKER", "0"))
+# Crash-Loop-Schutz: Neustart mit wachsender Pause, zurückgesetzt wenn ein Worker so lange lief
+RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("SENTIMENT_RESTART_BACKOFF_MAX_SECONDS", "30"))
+HEALTHY_UPTIME_SECONDS = 60.0
+
+# Vom Supervisor vor dem Fork gesetzt; die Kinder erben es (copy-on-write).
+_RUNTIME: SentimentRuntime | None = None
+
+
+def threads_per_worker(workers: int) -> int:
+    return THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // workers)
+
+
+def _worker(index: int, threads: int) -> None:
+    from .main import serve
+
+    # Handler des Supervisors nicht erben: SIGTERM beendet den Worker direkt,
+    # Ctrl-C der Prozessgruppe erledigt der Supervisor
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    torch.set_num_threads(threads)
+    # ohne geerbtes Modell (ONNX) lädt jeder Worker selbst
+    serve(_RUNTIME or load_runtime(), name=f"sentiment-{index}")
+
+
+class Supervisor:
+    """
+    Lädt das Modell einmal und forkt `workers` Consumer-Prozesse:
+    - Gewichte werden copy-on-write geteilt (nur Lesezugriffe, also kein N-facher RAM)
+    - torch.set_num_threads pro Worker, damit sich die Worker nicht gegenseitig überbuchen
+    - abgestürzte Worker werden (mit Backoff) neu gestartet
+    - SIGTERM/SIGINT beendet alle Worker sauber
+    """
+
+    def __init__(self, workers: int, threads: int | None = None):
+        self.workers = workers
+        self.threads = threads or threads_per_worker(workers)
+        self._ctx = mp.get_context("fork")
+        self._procs: dict[int, mp.Process] = {}
+        self._started: dict[int, float] = {}
+        self._failures: dict[int, int] = {}
+        self._stopping = False
+
+    def _spawn(self, index: int) -> None:
+        proc = self._ctx.Process(target=_worker, args=(index, self.threads), name=f"sentiment-{index}", daemon=True)
+        proc.start()
+        self._procs[index] = proc
+        self._started[index] = time.monotonic()
+
+    def _restart_delay(self, index: int, uptime: float) -> float:
+        """Pause vor dem Neustart: 0, 1, 3, 7, … s, nach HEALTHY_UPTIME_SECONDS Laufzeit wieder ab 0."""
+        if uptime >= HEALTHY_UPTIME_SECONDS:
+            self._failures[index] = 0
+        failures = self._failures.get(index, 0)
+        self._failures[index] = failures + 1
+        return min(RESTART_BACKOFF_MAX_SECONDS, 2 ** failures - 1)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def run(self) -> int:
+        global _RUNTIME
+
+        # Vor dem Laden: sonst startet torch (int8-Quantisierung, Buffer-Init) schon im Supervisor
+        # einen OpenMP-Pool über alle Kerne. Dessen Threads werden nicht mitgeforkt, die Kinder
+        # erben nur seinen Zustand und können in der ersten parallelen Region hängen.
+        # Die Worker setzen ihre eigene Thread-Zahl in _worker().
+        torch.set_num_threads(1)
+        # ORT-Sessions (und ihre Threadpools) überleben keinen Fork -> ONNX lädt jeder Worker selbst
+        _RUNTIME = None if SENTIMENT_BACKEND == "onnx" else load_runtime()
+        # Objekte aus dem Modell-Laden nicht mehr vom GC anfassen lassen -> weniger kopierte Seiten
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for index in range(self.workers):
+            self._spawn(index)
+        print(f"👷 Supervisor started {self.workers} workers × {self.threads} threads")
+
+        restarts: dict[int, float] = {}  # index -> frühester Neustart
+        while not self._stopping:
+            wait([p.sentinel for p in self._procs.values() if p.is_alive()], timeout=1.0)
+
+            now = time.monotonic()
+            for index, proc in list(self._procs.items()):
+                if proc.is_alive() or index in restarts or self._stopping:
+                    continue
+                proc.join()
+                delay = self._restart_delay(index, now - self._started[index])
+                print(f"⚠️ worker {index} exited with {proc.exitcode}, restarting in {delay:.0f}s")
+                restarts[index] = now + delay
+
+            for index, due in list(restarts.items()):
+                if due <= now and not self._stopping:
+                    del restarts[index]
+                    self._spawn(index)
+
+        return self.shutdown()
+
+    def shutdown(self, timeout_seconds: float = 10.0) -> int:
+        for proc in self._procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        deadline = time.monotonic() + timeout_seconds
+        for proc in self._procs.values():
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+        print("👋 Supervisor stopped")
+        return 0
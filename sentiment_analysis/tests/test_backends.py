@@ -0,0 +1,61 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from transformers import BertConfig
+
+from simple_social_sentiment.backends import export_onnx, export_torchscript, load_backend, parity_report
+from simple_social_sentiment.benchmark import make_texts, random_tokenizer
+from simple_social_sentiment.model import LABELS, SentimentClassifier
+
+pytestmark = pytest.mark.sentiment
+
+TINY_BERT = {
+    "vocab_size": 200,
+    "hidden_size": 32,
+    "num_hidden_layers": 2,
+    "num_attention_heads": 2,
+    "intermediate_size": 64,
+    "max_position_embeddings": 128,
+}
+
+
+@pytest.fixture(scope="module")
+def tiny(tmp_path_factory):
+    torch.manual_seed(0)
+    workdir = tmp_path_factory.mktemp("tiny-bert")
+    tokenizer = random_tokenizer(TINY_BERT["vocab_size"], str(workdir))
+    model = SentimentClassifier(n_classes=len(LABELS), config=BertConfig(**TINY_BERT)).eval()
+    return model, tokenizer
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnx"])
+def test_exported_backend_matches_eager(tiny, tmp_path, backend):
+    if backend == "onnx":
+        pytest.importorskip("onnx")
+        pytest.importorskip("onnxruntime")
+    model, tokenizer = tiny
+    path = str(tmp_path / f"model.{backend}")
+    export = export_torchscript if backend == "torchscript" else export_onnx
+    export(model, tokenizer, path)
+
+    forward = load_backend(backend, lambda: pytest.fail("fp32 model must not be built"), torch.device("cpu"), path)
+    # gemischte Längen, damit Padding/Attention-Maske und dynamische Achsen mitgeprüft werden
+    texts = make_texts(5, 6, TINY_BERT["vocab_size"]) + make_texts(5, 40, TINY_BERT["vocab_size"], seed=1)
+    report = parity_report(model, forward, tokenizer, texts, batch_size=4, max_length=64)
+
+    assert report["texts"] == len(texts)
+    assert report["agreement"] == 1.0
+    assert report["max_abs_logit_diff"] < 1e-3
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown SENTIMENT_BACKEND"):
+        load_backend("tensorrt", lambda: None, torch.device("cpu"))
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+def test_cpu_only_backends_reject_other_devices(backend):
+    with pytest.raises(ValueError, match="only runs on CPU"):
+        load_backend(backend, lambda: pytest.fail("must fail before loading"), torch.device("cuda"))
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from simple_social_sentiment import cascade as C
+from simple_social_sentiment.cascade import HashedNgramClassifier, SentimentCascade
+
+pytestmark = pytest.mark.sentiment
+
+NEGATIVE, NEUTRAL, POSITIVE = 0, 1, 2
+
+
+def _fixed(label: int, p: float) -> HashedNgramClassifier:
+    # Ohne Gewichte entscheidet nur der Bias: `label` bekommt Wahrscheinlichkeit p, der Rest teilt sich 1 - p
+    fast = HashedNgramClassifier.empty(dims=16)
+    fast.bias[:] = math.log((1 - p) / 2)
+    fast.bias[label] = math.log(p)
+    return fast
+
+
+def test_fit_learns_tiny_corpus():
+    corpus = {
+        "i love this, great day": POSITIVE,
+        "what a wonderful picture": POSITIVE,
+        "i hate this, awful day": NEGATIVE,
+        "what a terrible picture": NEGATIVE,
+        "the bus leaves at noon": NEUTRAL,
+        "the meeting is on monday": NEUTRAL,
+    }
+    fast = HashedNgramClassifier.empty(dims=2**10).fit(list(corpus), list(corpus.values()), epochs=30, lr=0.5)
+
+    predicted = [int(fast.proba(text).argmax()) for text in corpus]
+
+    assert predicted == list(corpus.values())
+    assert np.isclose(fast.proba("love").sum(), 1.0)
+
+
+@pytest.mark.parametrize(
+    "threshold, offloaded",
+    [(0.8, True), (0.84, True), (0.86, False), (0.9, False)],
+)
+def test_route_respects_threshold(threshold, offloaded):
+    cascade = SentimentCascade(_fixed(POSITIVE, 0.85), threshold)
+
+    labels, uncertain = cascade.route(["a", "b"])
+
+    if offloaded:
+        assert labels == ["Positive", "Positive"] and uncertain == []
+    else:
+        assert labels == [None, None] and uncertain == [0, 1]
+
+
+def test_route_accepts_confident_neutral():
+    labels, uncertain = SentimentCascade(_fixed(NEUTRAL, 0.99), 0.9).route(["x"])
+
+    assert labels == ["Neutral"]
+    assert uncertain == []
+
+
+def test_route_never_decides_negative():
+    labels, uncertain = SentimentCascade(_fixed(NEGATIVE, 0.999), 0.5).route(["x", "y"])
+
+    assert labels == [None, None]
+    assert uncertain == [0, 1]
+
+
+def test_predict_batch_sends_only_uncertain_texts_to_bert(monkeypatch):
+    fast = _fixed(POSITIVE, 0.5)
+    # "great" schiebt sicher auf Positive, "awful" sicher auf Negative
+    fast.weights[C.ngram_features("great", fast.dims), POSITIVE] = 10.0
+    fast.weights[C.ngram_features("awful", fast.dims), NEGATIVE] = 10.0
+    seen = []
+
+    def fake_predict_batch(runtime, texts):
+        seen.extend(texts)
+        return ["Negative"] * len(texts)
+
+    monkeypatch.setattr(C, "predict_batch", fake_predict_batch)
+    cascade = SentimentCascade(fast, 0.9)
+
+    labels = cascade.predict_batch(object(), ["great", "awful", "great"])
+
+    assert labels == ["Positive", "Negative", "Positive"]
+    assert seen == ["awful"]
+    assert (cascade.total, cascade.offloaded) == (3, 2)
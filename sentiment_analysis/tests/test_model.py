@@ -0,0 +1,115 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from transformers import BertConfig
+
+from simple_social_sentiment import model as M
+from simple_social_sentiment.benchmark import make_texts, random_tokenizer
+
+pytestmark = pytest.mark.sentiment
+
+TINY_BERT = {
+    "vocab_size": 200,
+    "hidden_size": 32,
+    "num_hidden_layers": 2,
+    "num_attention_heads": 2,
+    "intermediate_size": 64,
+    "max_position_embeddings": 128,
+}
+
+
+@pytest.fixture(scope="module")
+def tokenizer(tmp_path_factory):
+    return random_tokenizer(TINY_BERT["vocab_size"], str(tmp_path_factory.mktemp("vocab")))
+
+
+def _mixed_texts() -> list[str]:
+    # Längen bewusst durcheinander, damit Sortieren nach Länge die Reihenfolge ändert
+    lengths = [70, 5, 33, 9, 100, 5, 41, 12, 64, 3]
+    return [make_texts(1, n, TINY_BERT["vocab_size"], seed=i)[0] for i, n in enumerate(lengths)]
+
+
+class LengthEcho:
+    """Fake-Forward: Logit 0 = echte Tokenlänge, merkt sich die gepaddeten Formen."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.shapes.append(tuple(input_ids.shape))
+        length = attention_mask.sum(-1).float()
+        return torch.stack([length, torch.zeros_like(length), -length], dim=-1)
+
+
+def test_length_buckets_respect_width():
+    lengths = [40, 3, 10, 36, 80, 4]
+
+    buckets = M.length_buckets(lengths, width=8)
+
+    assert buckets == [[1, 5, 2], [3, 0], [4]]
+    assert sorted(i for b in buckets for i in b) == list(range(len(lengths)))
+
+
+def test_predict_logits_keeps_input_order(tokenizer):
+    texts = _mixed_texts()
+    runtime = M.SentimentRuntime(model=LengthEcho(), tokenizer=tokenizer, device=torch.device("cpu"))
+
+    logits = M.predict_logits(runtime, texts)
+
+    expected = [len(ids) for ids in tokenizer(texts, truncation=True, max_length=M.MAX_LENGTH)["input_ids"]]
+    assert logits[:, 0].tolist() == expected
+    assert len(runtime.model.shapes) > 1  # wirklich in mehrere Buckets aufgeteilt
+
+
+def test_each_bucket_is_padded_to_multiple_of_8(tokenizer):
+    texts = _mixed_texts()
+
+    buckets = M.tokenize_buckets(tokenizer, texts, width=16)
+
+    assert len(buckets) > 1
+    for indices, inputs in buckets:
+        seq_len = inputs["input_ids"].shape[1]
+        assert seq_len % 8 == 0
+        assert inputs["input_ids"].shape[0] == len(indices)
+        # nur auf den längsten Text des Buckets gepaddet (aufgerundet auf 8)
+        assert seq_len - int(inputs["attention_mask"].sum(-1).max()) < 8
+
+
+def test_bucketed_prediction_matches_single_padded_batch(tokenizer):
+    torch.manual_seed(0)
+    model = M.SentimentClassifier(n_classes=len(M.LABELS), config=BertConfig(**TINY_BERT)).eval()
+    runtime = M.SentimentRuntime(model=model, tokenizer=tokenizer, device=torch.device("cpu"))
+    texts = _mixed_texts()
+
+    enc = tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=M.MAX_LENGTH)
+    with torch.inference_mode():
+        reference = model(enc["input_ids"], enc["attention_mask"])
+
+    torch.testing.assert_close(M.predict_logits(runtime, texts), reference, atol=1e-4, rtol=1e-4)
+    assert M.predict_batch(runtime, texts) == [M.LABELS[int(i)] for i in reference.argmax(-1)]
+
+
+def test_bundle_round_trip(tokenizer, tmp_path):
+    torch.manual_seed(0)
+    model = M.SentimentClassifier(n_classes=len(M.LABELS), config=BertConfig(**TINY_BERT)).eval()
+    state = model.state_dict()
+    # ältere Checkpoints tragen den Buffer noch im state_dict – darf das Bundle nicht stören
+    legacy = {**state, "bert.embeddings.position_ids": torch.arange(TINY_BERT["max_position_embeddings"])[None]}
+
+    M.save_bundle(legacy, str(tmp_path), tokenizer=tokenizer, config=BertConfig(**TINY_BERT))
+    loaded = M.load_bundled_model(str(tmp_path), torch.device("cpu"))
+
+    assert M.has_bundle(str(tmp_path))
+    assert loaded.state_dict().keys() == state.keys()
+    for key, value in state.items():
+        assert torch.equal(loaded.state_dict()[key], value), key
+    enc = tokenizer(_mixed_texts(), return_tensors="pt", padding=True)
+    with torch.inference_mode():
+        assert torch.equal(loaded(enc["input_ids"], enc["attention_mask"]), model(enc["input_ids"], enc["attention_mask"]))
+
+
+def test_save_bundle_rejects_mismatching_state(tmp_path):
+    with pytest.raises(ValueError, match="missing"):
+        M.save_bundle({}, str(tmp_path), config=BertConfig(**TINY_BERT))
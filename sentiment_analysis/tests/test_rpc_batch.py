@@ -0,0 +1,126 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from simple_social_sentiment import main as M
+
+pytestmark = pytest.mark.sentiment
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+        self.acks = []
+        self.nacks = []
+
+    def basic_publish(self, exchange, routing_key, properties, body):
+        self.published.append((routing_key, properties.correlation_id, json.loads(body)))
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.nacks.append((delivery_tag, requeue))
+
+
+def _delivery(tag: int, body, reply_to: str = "amq.rabbitmq.reply-to"):
+    method = SimpleNamespace(delivery_tag=tag)
+    props = SimpleNamespace(reply_to=f"{reply_to}.{tag}", correlation_id=f"corr-{tag}")
+    if not isinstance(body, bytes):
+        body = json.dumps({"text": body}).encode()
+    return (0.0, method, props, body)
+
+
+@pytest.fixture
+def fake_predict(monkeypatch):
+    calls = []
+
+    def predict_batch(runtime, texts):
+        calls.append(list(texts))
+        return ["Negative" if "hate" in t else "Positive" for t in texts]
+
+    monkeypatch.setattr(M, "predict_batch", predict_batch)
+    return calls
+
+
+def test_handle_batch_replies_per_message_and_acks_once(fake_predict):
+    channel = FakeChannel()
+    stats = M.ThroughputStats(interval=0)
+    batch = [_delivery(1, "love it"), _delivery(2, "hate it"), _delivery(3, "nice")]
+
+    M.handle_batch(channel, object(), batch, stats)
+
+    assert fake_predict == [["love it", "hate it", "nice"]]  # ein Forward-Pass für den Batch
+    assert channel.published == [
+        ("amq.rabbitmq.reply-to.1", "corr-1", {"sentiment": "Positive"}),
+        ("amq.rabbitmq.reply-to.2", "corr-2", {"sentiment": "Negative"}),
+        ("amq.rabbitmq.reply-to.3", "corr-3", {"sentiment": "Positive"}),
+    ]
+    assert channel.acks == [(3, True)]
+    assert channel.nacks == []
+    assert (stats.messages, stats.batches) == (3, 1)
+
+
+def test_handle_batch_drops_unparseable_messages(fake_predict):
+    channel = FakeChannel()
+    batch = [_delivery(1, "love it"), _delivery(2, b"{not json"), _delivery(3, "hate it")]
+
+    M.handle_batch(channel, object(), batch, M.ThroughputStats(interval=0))
+
+    assert channel.nacks == [(2, False)]
+    assert fake_predict == [["love it", "hate it"]]
+    assert [corr for _, corr, _ in channel.published] == ["corr-1", "corr-3"]
+    assert channel.acks == [(3, True)]
+
+
+def test_handle_batch_with_only_unparseable_messages_does_not_ack(fake_predict):
+    channel = FakeChannel()
+
+    M.handle_batch(channel, object(), [_delivery(7, b"\xff")], M.ThroughputStats(interval=0))
+
+    assert channel.nacks == [(7, False)]
+    assert channel.acks == []
+    assert channel.published == []
+    assert fake_predict == []
+
+
+@pytest.mark.parametrize("body", [b'{"text": null}', b'{"text": 123}', b'["not", "an", "object"]'])
+def test_handle_batch_drops_non_string_text(fake_predict, body):
+    channel = FakeChannel()
+    batch = [_delivery(1, "ok"), _delivery(2, body), _delivery(3, "fine")]
+
+    M.handle_batch(channel, object(), batch, M.ThroughputStats(interval=0))
+
+    assert channel.nacks == [(2, False)]
+    assert fake_predict == [["ok", "fine"]]
+    assert [corr for _, corr, _ in channel.published] == ["corr-1", "corr-3"]
+    assert channel.acks == [(3, True)]
+
+
+def test_failed_batch_is_retried_one_by_one(monkeypatch):
+    calls = []
+
+    def predict_batch(runtime, texts):
+        calls.append(list(texts))
+        if "poison" in texts:
+            raise RuntimeError("tokenizer exploded")
+        return ["Positive"] * len(texts)
+
+    monkeypatch.setattr(M, "predict_batch", predict_batch)
+    channel = FakeChannel()
+    batch = [_delivery(1, "ok"), _delivery(2, "poison"), _delivery(3, "fine")]
+
+    M.handle_batch(channel, object(), batch, M.ThroughputStats(interval=0))
+
+    assert calls == [["ok", "poison", "fine"], ["ok"], ["poison"], ["fine"]]
+    # nur die fehlerhafte Nachricht wird verworfen, die anderen bekommen ihre Antwort
+    assert channel.nacks == [(2, False)]
+    assert channel.acks == [(1, False), (3, False)]
+    assert channel.published == [
+        ("amq.rabbitmq.reply-to.1", "corr-1", {"sentiment": "Positive"}),
+        ("amq.rabbitmq.reply-to.3", "corr-3", {"sentiment": "Positive"}),
+    ]
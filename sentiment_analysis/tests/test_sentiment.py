@@ -1,11 +1,13 @@
 import pytest
 import io
+import json
 from unittest.mock import patch
 
 pytestmark = pytest.mark.sentiment  # markiere alle tests in dieser datei als "sentiment"-tests
 
 def create_dummy_image():
-    return ("test.jpg", io.BytesIO(b"fake_image_content"), "image/jpeg")
+    # JPEG-Magic-Bytes, damit der Upload die Typprüfung im Backend besteht
+    return ("test.jpg", io.BytesIO(b"\xff\xd8\xff\xe0fake_image_content"), "image/jpeg")
 
 def test_create_post_blocks_negative_sentiment(client):
     with patch("simple_social_backend.main.check_sentiment_rpc", return_value="Negative"):
@@ -17,9 +19,19 @@ def test_create_post_blocks_negative_sentiment(client):
     assert response.status_code == 400
     assert "Only Positive/Neutral vibes allowed" in response.json()["detail"]
 
+def _resize_events_for(post_id):
+    # Resize-Events landen per Transactional Outbox in event_outbox (gleiche Transaktion wie der Post)
+    from sqlalchemy import text
+    from simple_social_backend.db import get_engine
+
+    with get_engine().connect() as conn:
+        bodies = conn.execute(
+            text("SELECT body FROM event_outbox WHERE queue = 'image_resize' ORDER BY id")
+        ).scalars()
+        return [e for e in (json.loads(bytes(b)) for b in bodies) if e["post_id"] == post_id]
+
 def test_create_post_allows_positive_sentiment(client):
-    with patch("simple_social_backend.main.check_sentiment_rpc", return_value="Positive"), \
-         patch("simple_social_backend.main.publish_image_resize") as mock_resize:
+    with patch("simple_social_backend.main.check_sentiment_rpc", return_value="Positive"):
         response = client.post(
             "/posts",
             data={"text": "I love this app!", "user": "happy_dog"},
@@ -29,4 +41,4 @@ def test_create_post_allows_positive_sentiment(client):
     data = response.json()
     assert data["text"] == "I love this app!"
     assert data["user"] == "happy_dog"
-    mock_resize.assert_called_once()
+    assert len(_resize_events_for(data["id"])) == 1
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+from simple_social_sentiment import server as S
+from simple_social_sentiment.model import SentimentRuntime
+
+pytestmark = pytest.mark.sentiment
+
+
+def fake_scores(runtime, texts):
+    # Label hängt nur vom Text ab -> Reihenfolge in der Antwort ist prüfbar
+    return [
+        ("Negative" if "bad" in t else "Positive", {"Negative": float("bad" in t), "Neutral": 0.0, "Positive": float("bad" not in t)})
+        for t in texts
+    ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    chunks = []
+
+    def predict_scores(runtime, texts):
+        chunks.append(list(texts))
+        return fake_scores(runtime, texts)
+
+    stub = SentimentRuntime(model=None, tokenizer=None, device=None, backend="stub", load_seconds=0.01)
+    monkeypatch.setattr(S, "load_runtime", lambda: stub)
+    monkeypatch.setattr(S, "predict_scores", predict_scores)
+    monkeypatch.setattr(S, "HTTP_BATCH_SIZE", 2)
+    with TestClient(S.app) as c:
+        c.chunks = chunks
+        yield c
+
+
+def test_health_reports_backend(client):
+    r = client.get("/health")
+
+    assert r.status_code == 200
+    assert r.json()["backend"] == "stub"
+
+
+def test_predict_returns_json_batch(client):
+    texts = ["good day", "bad day", "good food"]
+
+    r = client.post("/predict", json={"texts": texts, "stream": False})
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["backend"] == "stub"
+    assert [res["label"] for res in body["results"]] == ["Positive", "Negative", "Positive"]
+    assert body["results"][1]["probabilities"]["Negative"] == 1.0
+    assert client.chunks == [["good day", "bad day"], ["good food"]]  # in HTTP_BATCH_SIZE-Chunks
+
+
+def test_predict_streams_ndjson_in_input_order(client):
+    texts = [f"{'bad' if i % 3 == 0 else 'good'} {i}" for i in range(7)]
+
+    with client.stream("POST", "/predict", json={"texts": texts, "stream": True}) as r:
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.iter_lines() if line]
+
+    assert [line["index"] for line in lines] == list(range(len(texts)))
+    assert [line["label"] for line in lines] == [fake_scores(None, [t])[0][0] for t in texts]
+
+
+def test_predict_streams_automatically_above_threshold(client, monkeypatch):
+    monkeypatch.setattr(S, "STREAM_THRESHOLD", 2)
+
+    r = client.post("/predict", json={"texts": ["a", "b", "c"]})
+
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["index"] for line in r.text.splitlines()] == [0, 1, 2]
+
+
+@pytest.mark.parametrize("count", [0, S.MAX_TEXTS + 1], ids=["empty", "oversized"])
+def test_predict_rejects_empty_and_oversized_batches(client, count):
+    r = client.post("/predict", json={"texts": [""] * count})
+
+    assert r.status_code == 422
+    assert client.chunks == []
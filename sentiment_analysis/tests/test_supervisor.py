@@ -0,0 +1,128 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from simple_social_sentiment import supervisor as S
+
+pytestmark = pytest.mark.sentiment
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeProcess:
+    """Statt fork: "läuft" `lifetime` Sekunden Fake-Zeit ab start()."""
+
+    def __init__(self, clock: FakeClock, lifetime: float):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.sentinel = object()
+        self.exitcode = None
+        self.started = None
+
+    def start(self):
+        self.started = self.clock()
+
+    def is_alive(self) -> bool:
+        alive = self.started is not None and self.clock() < self.started + self.lifetime
+        if not alive:
+            self.exitcode = 1
+        return alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.lifetime = 0
+
+    kill = terminate
+
+
+class FakeContext:
+    def __init__(self, clock: FakeClock, lifetimes: list[float]):
+        self.clock = clock
+        self.lifetimes = list(lifetimes)
+        self.spawned_at: list[float] = []
+
+    def Process(self, target, args, name, daemon):
+        self.spawned_at.append(self.clock())
+        return FakeProcess(self.clock, self.lifetimes.pop(0))
+
+
+@pytest.fixture
+def restore_threads():
+    previous = torch.get_num_threads()
+    yield
+    torch.set_num_threads(previous)
+
+
+@pytest.fixture
+def fake_env(monkeypatch, restore_threads):
+    clock = FakeClock()
+    loaded_with_threads = []
+
+    def fake_load_runtime():
+        loaded_with_threads.append(torch.get_num_threads())
+        return object()
+
+    monkeypatch.setattr(S.time, "monotonic", clock)
+    monkeypatch.setattr(S, "SENTIMENT_BACKEND", "eager")
+    monkeypatch.setattr(S, "load_runtime", fake_load_runtime)
+    monkeypatch.setattr(S, "_RUNTIME", None)
+    monkeypatch.setattr(S.gc, "freeze", lambda: None)
+    monkeypatch.setattr(S.signal, "signal", lambda *args: None)
+    return clock, loaded_with_threads
+
+
+def _run(monkeypatch, clock, lifetimes: list[float]) -> tuple[S.Supervisor, list[float]]:
+    supervisor = S.Supervisor(workers=1, threads=2)
+    ctx = FakeContext(clock, lifetimes)
+    supervisor._ctx = ctx
+    delays = []
+    restart_delay = supervisor._restart_delay
+
+    def recording_delay(index, uptime):
+        delays.append(restart_delay(index, uptime))
+        return delays[-1]
+
+    def fake_wait(sentinels, timeout):
+        clock.now += timeout
+        if not ctx.lifetimes:  # alle geplanten Prozesse gestartet
+            supervisor._stopping = True
+
+    supervisor._restart_delay = recording_delay
+    monkeypatch.setattr(S, "wait", fake_wait)
+    assert supervisor.run() == 0
+    return supervisor, delays
+
+
+def test_restart_backoff_grows_and_resets_after_healthy_uptime(monkeypatch, fake_env):
+    clock, _ = fake_env
+    # vier Abstürze direkt nach dem Start, dann 100 s gesund, dann wieder zwei Abstürze
+    _, delays = _run(monkeypatch, clock, [0, 0, 0, 0, 100, 0, 0, 0])
+
+    assert delays == [0, 1, 3, 7, 0, 1, 3]
+
+
+def test_restart_backoff_is_capped(monkeypatch, fake_env):
+    clock, _ = fake_env
+    monkeypatch.setattr(S, "RESTART_BACKOFF_MAX_SECONDS", 5.0)
+
+    _, delays = _run(monkeypatch, clock, [0] * 6)
+
+    assert delays == [0, 1, 3, 5, 5]
+
+
+def test_model_is_loaded_single_threaded_before_fork(monkeypatch, fake_env):
+    clock, loaded_with_threads = fake_env
+    torch.set_num_threads(4)
+
+    _run(monkeypatch, clock, [0, 0])
+
+    assert loaded_with_threads == [1]
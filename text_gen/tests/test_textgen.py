@@ -1,8 +1,10 @@
 # backend/tests/test_textgen.py
+import asyncio
+import json
+
 import pytest
-from sqlalchemy import delete
+from sqlalchemy import delete, text
 from sqlmodel import Session
-from fastapi.testclient import TestClient
 
 from simple_social_backend.db import get_engine
 from simple_social_backend.models import TextGenJob
@@ -28,27 +30,26 @@ def _latest_job_by_prompt(prompt: str) -> TextGenJob | None:
         ).first()
 
 
-def test_textgen_job_is_created_and_can_be_updated(client, monkeypatch):
+def _outbox_jobs(job_id: int) -> list[dict]:
+    # Jobs werden nicht mehr im Request veröffentlicht, sondern per Outbox (gleiche Transaktion)
+    with Session(get_engine()) as session:
+        rows = session.execute(
+            text("SELECT body, attempts FROM event_outbox WHERE queue = 'text_generation' ORDER BY id")
+        ).all()
+    events = [dict(json.loads(bytes(body)), attempts=attempts) for body, attempts in rows]
+    return [e for e in events if e["job_id"] == job_id]
+
+
+def test_textgen_job_is_created_and_can_be_updated(client):
     """
     Verifiziert:
     - POST /textgen/jobs legt Job an (status=pending)
-    - publish_textgen_job wird aufgerufen (stub, kein RabbitMQ nötig)
+    - Job-Event liegt in der Outbox (kein RabbitMQ nötig)
     - GET /textgen/jobs/{id} liefert Job
     - PUT /textgen/jobs/{id} updated status/generated_text/error
     """
     _clear_textgen_jobs()
 
-    # --- stub publish_textgen_job, damit kein RabbitMQ gebraucht wird ---
-    calls = {}
-
-    def fake_publish_textgen_job(job_id: int, prompt: str, max_new_tokens: int = 60) -> None:
-        calls["job_id"] = job_id
-        calls["prompt"] = prompt
-        calls["max_new_tokens"] = max_new_tokens
-
-    import simple_social_backend.main as api
-    monkeypatch.setattr(api, "publish_textgen_job", fake_publish_textgen_job, raising=True)
-
     # --- 1) Create job ---
     payload = {"prompt": "Hello from test", "max_new_tokens": 12}
     r = client.post("/textgen/jobs", json=payload)
@@ -62,10 +63,11 @@ def test_textgen_job_is_created_and_can_be_updated(client, monkeypatch):
     assert job.get("generated_text") in (None, "")
     assert job.get("error") in (None, "")
 
-    # publish was called
-    assert calls["job_id"] == job["id"]
-    assert calls["prompt"] == payload["prompt"]
-    assert calls["max_new_tokens"] == payload["max_new_tokens"]
+    # event was written together with the job
+    [event] = _outbox_jobs(job["id"])
+    assert event["type"] == "job"
+    assert event["prompt"] == payload["prompt"]
+    assert event["max_new_tokens"] == payload["max_new_tokens"]
 
     # --- 2) Read job ---
     r = client.get(f"/textgen/jobs/{job['id']}")
@@ -93,31 +95,30 @@ def test_textgen_job_is_created_and_can_be_updated(client, monkeypatch):
     assert job4["error"] is None
 
 
-def test_textgen_publish_failure_marks_job_error(monkeypatch):
+def test_textgen_job_survives_broker_outage(client, monkeypatch):
     """
     Robustness:
-    - publish_textgen_job crasht (RabbitMQ down)
-    - API call liefert 5xx (weil Exception hochgeht)
-    - ABER: Job wird trotzdem in DB als status=error markiert
+    - RabbitMQ ist down, der Outbox-Relay kann nicht veröffentlichen
+    - API call liefert trotzdem 200, Job bleibt pending
+    - Event bleibt in der Outbox (mit Retry-Zähler) und geht nicht verloren
     """
     _clear_textgen_jobs()
 
-    def boom(*args, **kwargs):
+    async def boom(*args, **kwargs):
         raise RuntimeError("rabbitmq down")
 
-    import simple_social_backend.main as api
-    monkeypatch.setattr(api, "publish_textgen_job", boom, raising=True)
-
-    # wichtig: exceptions als HTTP 500 bekommen, nicht re-raise
-    tc = TestClient(api.app, raise_server_exceptions=False)
+    import simple_social_backend.outbox as outbox
+    monkeypatch.setattr(outbox, "publish_confirmed", boom, raising=True)
 
     payload = {"prompt": "this will fail", "max_new_tokens": 5}
-    r = tc.post("/textgen/jobs", json=payload)
+    r = client.post("/textgen/jobs", json=payload)
+    assert r.status_code == 200, r.text
+    job_id = r.json()["id"]
 
-    assert r.status_code >= 500, r.text
+    assert asyncio.run(outbox.relay_batch()) == 0
 
     job = _latest_job_by_prompt(payload["prompt"])
     assert job is not None
-    assert job.status == "error"
-    # optional, aber nice:
-    assert job.error is None or len(str(job.error)) > 0
+    assert job.status == "pending"
+    [event] = _outbox_jobs(job_id)
+    assert event["attempts"] == 1